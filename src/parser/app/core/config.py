@@ -11,6 +11,37 @@ class Config:
     DB_USER: str = os.getenv('DB_USER')
     DB_PASS: str = os.getenv('DB_PASS')
 
+    START_DATE: str = os.getenv('START_DATE', '2025-01-01')
+    RELOAD_DAYS: int = int(os.getenv('RELOAD_DAYS', 1))
+    MISSING_RECHECK_DAYS: int = int(os.getenv('MISSING_RECHECK_DAYS', 7))
+
+    REPORT_BASE_URL: str = os.getenv('REPORT_BASE_URL', 'https://spimex.com')
+    REPORT_CACHE_DIR: str = os.getenv('REPORT_CACHE_DIR', 'cache')
+    REPORT_CACHE_MAX_BYTES: int = int(os.getenv('REPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+    FETCH_CONCURRENCY: int = int(os.getenv('FETCH_CONCURRENCY', 20))
+    FETCH_RETRIES: int = int(os.getenv('FETCH_RETRIES', 3))
+    FETCH_BACKOFF: float = float(os.getenv('FETCH_BACKOFF', 0.5))
+
+    HOLIDAYS: str = os.getenv('HOLIDAYS', '')
+    WORKING_DAYS: str = os.getenv('WORKING_DAYS', '')
+
+    DECODE_WORKERS: int = int(os.getenv('DECODE_WORKERS', 0))
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv('PIPELINE_QUEUE_SIZE', 20))
+
+    LOADER_MODE: str = os.getenv('LOADER_MODE', 'copy')
+    LOADER_BATCH_SIZE: int = int(os.getenv('LOADER_BATCH_SIZE', 1000))
+
+    INGEST_TIME: str = os.getenv('INGEST_TIME', '16:20')
+    INGEST_DEADLINE: str = os.getenv('INGEST_DEADLINE', '23:30')
+    INGEST_TIMEZONE: str = os.getenv('INGEST_TIMEZONE', 'Europe/Moscow')
+    INGEST_POLL_MIN: float = float(os.getenv('INGEST_POLL_MIN', 10))
+    INGEST_POLL_MAX: float = float(os.getenv('INGEST_POLL_MAX', 300))
+
+    PARTITION_INTERVAL: str = os.getenv('PARTITION_INTERVAL', 'month')
+
+    METRICS_TEXTFILE: str = os.getenv('METRICS_TEXTFILE', '')
+
     @property
     def ASYNC_DB_URL(self) -> str:
         return f'postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
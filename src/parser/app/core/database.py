@@ -1,5 +1,7 @@
 from core.config import config
+from core.migrations import apply_migrations
 from models import Base
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 async_engine = create_async_engine(config.ASYNC_DB_URL)
@@ -8,9 +10,12 @@ async_session = async_sessionmaker(async_engine)
 
 async def init_models() -> None:
     async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        applied = await apply_migrations(conn)
+    for version in applied:
+        print(f'Applied migration {version}')
 
 
 async def drop_models() -> None:
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+        await conn.execute(text('DROP TABLE IF EXISTS schema_migrations'))
@@ -0,0 +1,231 @@
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from core.config import config
+from utils.partitions import DEFAULT_PARTITION, ensure_partitions
+
+MIGRATIONS_LOCK_ID = 7_312_025
+
+Statement = str | Callable[[AsyncConnection], Awaitable[object]]
+
+
+TRADING_RESULTS_COLUMNS = (
+    'id, exchange_product_id, exchange_product_name, oil_id, delivery_basis_id, '
+    'delivery_basis_name, delivery_type_id, volume, total, count, date, created_at, updated_ap'
+)
+
+
+async def partition_existing_rows(conn: AsyncConnection) -> None:
+    result = await conn.scalars(text('SELECT DISTINCT date FROM trading_results_heap'))
+    await ensure_partitions(conn, set(result.all()), config.PARTITION_INTERVAL)
+    # The column order depends on whether the table came from create_all or
+    # from an earlier version of 0001, so rows are copied by name.
+    await conn.execute(
+        text(
+            f'INSERT INTO trading_results ({TRADING_RESULTS_COLUMNS}) '
+            f'SELECT {TRADING_RESULTS_COLUMNS} FROM trading_results_heap ORDER BY date, id'
+        )
+    )
+
+
+MIGRATIONS: list[tuple[str, list[Statement]]] = [
+    (
+        '0001_initial',
+        [
+            """
+            CREATE TABLE IF NOT EXISTS trading_results (
+                exchange_product_id VARCHAR NOT NULL,
+                exchange_product_name VARCHAR NOT NULL,
+                oil_id VARCHAR NOT NULL,
+                delivery_basis_id VARCHAR NOT NULL,
+                delivery_basis_name VARCHAR NOT NULL,
+                delivery_type_id VARCHAR NOT NULL,
+                volume INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                date DATE NOT NULL,
+                id SERIAL PRIMARY KEY,
+                created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+                updated_ap TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+                CONSTRAINT uq_exchange_product_id_date UNIQUE (exchange_product_id, date)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS ingestion_states (
+                date DATE NOT NULL UNIQUE,
+                rows_count INTEGER NOT NULL,
+                checksum VARCHAR NOT NULL,
+                id SERIAL PRIMARY KEY,
+                created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+                updated_ap TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL
+            )
+            """,
+        ],
+    ),
+    (
+        '0002_trading_results_indexes',
+        [
+            """
+            CREATE INDEX IF NOT EXISTS ix_trading_results_date_id
+            ON trading_results (date DESC, id DESC)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_trading_results_oil_id_date_id
+            ON trading_results (oil_id, date DESC, id DESC)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_trading_results_delivery_basis_type_date_id
+            ON trading_results (delivery_basis_id, delivery_type_id, date DESC, id DESC)
+            """,
+        ],
+    ),
+    (
+        '0003_trading_days',
+        [
+            """
+            CREATE TABLE IF NOT EXISTS trading_days (
+                id SERIAL PRIMARY KEY,
+                date DATE NOT NULL UNIQUE,
+                rows_count INTEGER NOT NULL,
+                volume BIGINT NOT NULL,
+                total BIGINT NOT NULL,
+                created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+                updated_ap TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL
+            )
+            """,
+            """
+            INSERT INTO trading_days (date, rows_count, volume, total)
+            SELECT date, count(*), sum(volume), sum(total)
+            FROM trading_results
+            GROUP BY date
+            ON CONFLICT (date) DO NOTHING
+            """,
+        ],
+    ),
+    (
+        '0004_trading_rollups',
+        [
+            """
+            CREATE TABLE IF NOT EXISTS trading_rollups (
+                id SERIAL PRIMARY KEY,
+                date DATE NOT NULL,
+                dimension VARCHAR NOT NULL,
+                value VARCHAR NOT NULL,
+                volume BIGINT NOT NULL,
+                total BIGINT NOT NULL,
+                count BIGINT NOT NULL,
+                created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+                updated_ap TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+                CONSTRAINT uq_dimension_value_date UNIQUE (dimension, value, date)
+            )
+            """,
+            """
+            INSERT INTO trading_rollups (date, dimension, value, volume, total, count)
+            SELECT date, dimension, value, sum(volume), sum(total), sum(count)
+            FROM trading_results,
+                 LATERAL (VALUES
+                     ('oil_id', oil_id),
+                     ('delivery_basis_id', delivery_basis_id),
+                     ('delivery_type_id', delivery_type_id)
+                 ) AS dimensions (dimension, value)
+            GROUP BY date, dimension, value
+            ON CONFLICT (dimension, value, date) DO NOTHING
+            """,
+        ],
+    ),
+    (
+        '0005_trading_results_partitioning',
+        [
+            'ALTER TABLE trading_results RENAME TO trading_results_heap',
+            'ALTER TABLE trading_results_heap RENAME CONSTRAINT trading_results_pkey '
+            'TO trading_results_heap_pkey',
+            'ALTER TABLE trading_results_heap RENAME CONSTRAINT uq_exchange_product_id_date '
+            'TO uq_heap_exchange_product_id_date',
+            'DROP INDEX ix_trading_results_date_id',
+            'DROP INDEX ix_trading_results_oil_id_date_id',
+            'DROP INDEX ix_trading_results_delivery_basis_type_date_id',
+            """
+            CREATE TABLE trading_results (
+                id INTEGER NOT NULL DEFAULT nextval('trading_results_id_seq'),
+                exchange_product_id VARCHAR NOT NULL,
+                exchange_product_name VARCHAR NOT NULL,
+                oil_id VARCHAR NOT NULL,
+                delivery_basis_id VARCHAR NOT NULL,
+                delivery_basis_name VARCHAR NOT NULL,
+                delivery_type_id VARCHAR NOT NULL,
+                volume INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                date DATE NOT NULL,
+                created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+                updated_ap TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+                CONSTRAINT trading_results_pkey PRIMARY KEY (id, date),
+                CONSTRAINT uq_exchange_product_id_date UNIQUE (exchange_product_id, date)
+            ) PARTITION BY RANGE (date)
+            """,
+            'ALTER SEQUENCE trading_results_id_seq OWNED BY trading_results.id',
+            f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF trading_results DEFAULT',
+            partition_existing_rows,
+            'DROP TABLE trading_results_heap',
+            """
+            CREATE INDEX ix_trading_results_date_id
+            ON trading_results (date DESC, id DESC)
+            """,
+            """
+            CREATE INDEX ix_trading_results_oil_id_date_id
+            ON trading_results (oil_id, date DESC, id DESC)
+            """,
+            """
+            CREATE INDEX ix_trading_results_delivery_basis_type_date_id
+            ON trading_results (delivery_basis_id, delivery_type_id, date DESC, id DESC)
+            """,
+        ],
+    ),
+    (
+        '0006_ingestion_states_status',
+        [
+            """
+            ALTER TABLE ingestion_states
+            ADD COLUMN IF NOT EXISTS status VARCHAR NOT NULL DEFAULT 'loaded'
+            """,
+        ],
+    ),
+]
+
+
+async def apply_migrations(conn: AsyncConnection) -> list[str]:
+    await conn.execute(
+        text('SELECT pg_advisory_xact_lock(:lock_id)'),
+        {'lock_id': MIGRATIONS_LOCK_ID},
+    )
+    await conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR PRIMARY KEY,
+                applied_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL
+            )
+            """
+        )
+    )
+
+    result = await conn.scalars(text('SELECT version FROM schema_migrations'))
+    applied_versions = set(result.all())
+
+    applied = []
+    for version, statements in MIGRATIONS:
+        if version in applied_versions:
+            continue
+        for statement in statements:
+            if callable(statement):
+                await statement(conn)
+            else:
+                await conn.execute(text(statement))
+        await conn.execute(
+            text('INSERT INTO schema_migrations (version) VALUES (:version)'),
+            {'version': version},
+        )
+        applied.append(version)
+    return applied
@@ -1,20 +1,130 @@
+import argparse
 import asyncio
-from datetime import date
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
 from time import time
 
-from core.database import init_models
+from core.config import config
+from core.database import async_engine, init_models
+from utils.daemon import run_daemon
 from utils.loaders import start_async_data_loader
+from utils.metrics import write_metrics
+from utils.partitions import detach_partitions
+from utils.stats import LoaderStats
+from utils.writers import delete_days, notify_day_loaded
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Load SPIMEX trading results.')
+    period = parser.add_mutually_exclusive_group()
+    period.add_argument('--start', type=date.fromisoformat, help='first date (YYYY-MM-DD)')
+    period.add_argument('--days', type=int, help='load the last N days up to --end')
+    parser.add_argument('--end', type=date.fromisoformat, help='last date (default: today)')
+    parser.add_argument('--workers', type=int, default=1, help='number of loader processes')
+    parser.add_argument('--force', action='store_true', help='reload already loaded days')
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='keep running and load each new report once it is published',
+    )
+    parser.add_argument(
+        '--detach-before',
+        type=date.fromisoformat,
+        help='detach partitions that end on or before this date and exit',
+    )
+    return parser.parse_args()
+
+
+def get_period(args: argparse.Namespace) -> tuple[date, date]:
+    end_date = args.end or date.today()
+    if args.days is not None:
+        if args.days < 1:
+            raise SystemExit(f'Invalid --days: {args.days}, expected at least 1')
+        start_date = end_date - timedelta(days=args.days - 1)
+    else:
+        start_date = args.start or date.fromisoformat(config.START_DATE)
+
+    if start_date > end_date:
+        raise SystemExit(f'Invalid period: {start_date} > {end_date}')
+    return start_date, end_date
+
+
+def split_period(start_date: date, end_date: date, shards: int) -> list[tuple[date, date]]:
+    total_days = (end_date - start_date).days + 1
+    shards = max(1, min(shards, total_days))
+    size, rest = divmod(total_days, shards)
+
+    periods = []
+    shard_start = start_date
+    for i in range(shards):
+        shard_end = shard_start + timedelta(days=size + (i < rest) - 1)
+        periods.append((shard_start, shard_end))
+        shard_start = shard_end + timedelta(days=1)
+    return periods
+
+
+def run_shard(start_date: date, end_date: date, force: bool, decode_workers: int) -> LoaderStats:
+    return asyncio.run(start_async_data_loader(start_date, end_date, force, decode_workers))
+
+
+async def detach_old_partitions(before: date) -> None:
+    async with async_engine.begin() as conn:
+        detached = await detach_partitions(conn, before)
+        dates = []
+        for _, start, end in detached:
+            dates += await delete_days(conn, start, end)
+        # Lets the API drop cached responses that still include these days.
+        for date_ in dates:
+            await notify_day_loaded(conn, date_)
+
+    for name, start, end in detached:
+        print(f'Detached partition {name} ({start}..{end})')
 
 
 async def main():
-    start_date = date(year=2025, month=1, day=1)
+    args = parse_args()
+    start_date, end_date = get_period(args)
 
     await init_models()
 
+    if args.detach_before:
+        await detach_old_partitions(args.detach_before)
+        return
+
     start = time()
-    await start_async_data_loader(start_date)
+    if args.workers <= 1:
+        stats = await start_async_data_loader(start_date, end_date, args.force)
+    else:
+        periods = split_period(start_date, end_date, args.workers)
+        decode_workers = config.DECODE_WORKERS or max(1, (os.cpu_count() or 1) // len(periods))
+
+        stats = LoaderStats()
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(
+            max_workers=len(periods),
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as executor:
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        executor, run_shard, shard_start, shard_end, args.force, decode_workers
+                    )
+                    for shard_start, shard_end in periods
+                )
+            )
+        for shard_stats in results:
+            stats.merge(shard_stats)
+
     delta = time() - start
     print(f'start_async_data_loader() was completed for {delta:.4f} seconds')
+    print(stats.report(delta))
+    if config.METRICS_TEXTFILE:
+        write_metrics(config.METRICS_TEXTFILE, stats, delta)
+
+    if args.daemon:
+        await run_daemon()
 
 
 if __name__ == '__main__':
@@ -1,2 +1,3 @@
 from .base import Base
-from .trading import TradingResult
+from .ingestion import IngestionState
+from .trading import TradingDay, TradingResult, TradingRollup
@@ -0,0 +1,18 @@
+import datetime
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+LOADED = 'loaded'
+MISSING = 'missing'
+REJECTED = 'rejected'
+
+
+class IngestionState(Base):
+    __tablename__ = 'ingestion_states'
+
+    date: Mapped[datetime.date] = mapped_column(unique=True)
+    rows_count: Mapped[int]
+    checksum: Mapped[str]
+    status: Mapped[str] = mapped_column(default=LOADED, server_default=LOADED)
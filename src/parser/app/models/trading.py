@@ -1,7 +1,7 @@
-from datetime import date
+import datetime
 
-from sqlalchemy import UniqueConstraint
-from sqlalchemy.orm import Mapped
+from sqlalchemy import DDL, BigInteger, Index, UniqueConstraint, event
+from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base
 
@@ -9,6 +9,7 @@ from .base import Base
 class TradingResult(Base):
     __tablename__ = 'trading_results'
 
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     exchange_product_id: Mapped[str]
     exchange_product_name: Mapped[str]
     oil_id: Mapped[str]
@@ -18,8 +19,58 @@ class TradingResult(Base):
     volume: Mapped[int]
     total: Mapped[int]
     count: Mapped[int]
-    date: Mapped[date]
+    date: Mapped[datetime.date] = mapped_column(primary_key=True)
 
     __table_args__ = (
         UniqueConstraint('exchange_product_id', 'date', name='uq_exchange_product_id_date'),
+        {'postgresql_partition_by': 'RANGE (date)'},
+    )
+
+
+# Rows outside of the created partitions land here, so the table accepts
+# inserts right after create_all.
+event.listen(
+    TradingResult.__table__,
+    'after_create',
+    DDL('CREATE TABLE trading_results_default PARTITION OF trading_results DEFAULT'),
+)
+
+
+Index('ix_trading_results_date_id', TradingResult.date.desc(), TradingResult.id.desc())
+Index(
+    'ix_trading_results_oil_id_date_id',
+    TradingResult.oil_id,
+    TradingResult.date.desc(),
+    TradingResult.id.desc(),
+)
+Index(
+    'ix_trading_results_delivery_basis_type_date_id',
+    TradingResult.delivery_basis_id,
+    TradingResult.delivery_type_id,
+    TradingResult.date.desc(),
+    TradingResult.id.desc(),
+)
+
+
+class TradingDay(Base):
+    __tablename__ = 'trading_days'
+
+    date: Mapped[datetime.date] = mapped_column(unique=True)
+    rows_count: Mapped[int]
+    volume: Mapped[int] = mapped_column(BigInteger)
+    total: Mapped[int] = mapped_column(BigInteger)
+
+
+class TradingRollup(Base):
+    __tablename__ = 'trading_rollups'
+
+    date: Mapped[datetime.date]
+    dimension: Mapped[str]
+    value: Mapped[str]
+    volume: Mapped[int] = mapped_column(BigInteger)
+    total: Mapped[int] = mapped_column(BigInteger)
+    count: Mapped[int] = mapped_column(BigInteger)
+
+    __table_args__ = (
+        UniqueConstraint('dimension', 'value', 'date', name='uq_dimension_value_date'),
     )
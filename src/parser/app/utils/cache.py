@@ -0,0 +1,142 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from time import time
+
+
+class ReportCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.__directory = Path(directory)
+        self.__blobs_dir = self.__directory / 'blobs'
+        self.__index_path = self.__directory / 'index.json'
+        self.__lock_path = self.__directory / 'index.lock'
+        self.__max_bytes = max_bytes
+        self.__lock = threading.Lock()
+
+        self.__blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.__index = self._load_index()
+        # Entries changed by this process since the index was last saved,
+        # None marks a removed one. Only these are merged into the index on
+        # disk, so parallel shards do not overwrite each other's entries.
+        self.__changes: dict[str, dict | None] = {}
+
+    def _load_index(self) -> dict[str, dict]:
+        try:
+            return json.loads(self.__index_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.__lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_index(self) -> None:
+        with self._file_lock():
+            index = self._load_index()
+            for url, entry in self.__changes.items():
+                if entry is None:
+                    index.pop(url, None)
+                else:
+                    index[url] = entry
+            self.__changes.clear()
+
+            self._evict(index)
+
+            tmp_path = self.__index_path.with_suffix(f'.{os.getpid()}.tmp')
+            tmp_path.write_text(json.dumps(index))
+            os.replace(tmp_path, self.__index_path)
+        self.__index = index
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.__blobs_dir / digest[:2] / digest
+
+    def validators(self, url: str) -> dict[str, str]:
+        with self.__lock:
+            entry = self.__index.get(url)
+        if entry is None or not self._blob_path(entry['digest']).exists():
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, url: str) -> bytes | None:
+        with self.__lock:
+            entry = self.__index.get(url)
+        if entry is None:
+            return None
+
+        try:
+            content = self._blob_path(entry['digest']).read_bytes()
+        except FileNotFoundError:
+            with self.__lock:
+                self.__index.pop(url, None)
+                self.__changes[url] = None
+            return None
+
+        # The access time only matters for eviction, it is saved together
+        # with the next stored report or on flush().
+        with self.__lock:
+            entry = entry | {'accessed_at': time()}
+            self.__index[url] = entry
+            self.__changes[url] = entry
+        return content
+
+    def store(self, url: str, content: bytes, etag: str | None, last_modified: str | None) -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not blob_path.exists():
+            blob_path.parent.mkdir(exist_ok=True)
+            tmp_path = blob_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, blob_path)
+
+        entry = {
+            'digest': digest,
+            'size': len(content),
+            'etag': etag,
+            'last_modified': last_modified,
+            'accessed_at': time(),
+        }
+        with self.__lock:
+            self.__index[url] = entry
+            self.__changes[url] = entry
+            self._save_index()
+        return digest
+
+    def flush(self) -> None:
+        with self.__lock:
+            if self.__changes:
+                self._save_index()
+
+    def _evict(self, index: dict[str, dict]) -> None:
+        blob_sizes = {entry['digest']: entry['size'] for entry in index.values()}
+        references = Counter(entry['digest'] for entry in index.values())
+        total_size = sum(blob_sizes.values())
+
+        by_access = sorted(index.items(), key=lambda item: item[1]['accessed_at'])
+        for url, entry in by_access:
+            if total_size <= self.__max_bytes:
+                break
+
+            del index[url]
+            digest = entry['digest']
+            references[digest] -= 1
+            if references[digest]:
+                continue
+
+            self._blob_path(digest).unlink(missing_ok=True)
+            total_size -= blob_sizes[digest]
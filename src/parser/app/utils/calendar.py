@@ -0,0 +1,35 @@
+from datetime import date
+
+FIXED_HOLIDAYS = (
+    (1, 1),
+    (1, 2),
+    (1, 3),
+    (1, 4),
+    (1, 5),
+    (1, 6),
+    (1, 7),
+    (1, 8),
+    (2, 23),
+    (3, 8),
+    (5, 1),
+    (5, 9),
+    (6, 12),
+    (11, 4),
+)
+
+
+def parse_dates(value: str) -> set[date]:
+    return {date.fromisoformat(item.strip()) for item in value.split(',') if item.strip()}
+
+
+class TradingCalendar:
+    def __init__(self, holidays: set[date] | None = None, working_days: set[date] | None = None):
+        self.__holidays = holidays or set()
+        self.__working_days = working_days or set()
+
+    def is_trading_day(self, date_: date) -> bool:
+        if date_ in self.__working_days:
+            return True
+        if date_ in self.__holidays or (date_.month, date_.day) in FIXED_HOLIDAYS:
+            return False
+        return date_.weekday() < 5
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+from zoneinfo import ZoneInfo
+
+from core.config import config
+from core.database import async_engine
+from models.ingestion import LOADED, REJECTED
+
+from utils.loaders import create_parser, get_calendar, start_async_data_loader
+from utils.metrics import write_metrics
+from utils.parsers import AsyncParser
+from utils.writers import get_ingestion_states
+
+
+async def get_status(date_: date) -> str | None:
+    async with async_engine.connect() as conn:
+        states = await get_ingestion_states(conn, date_)
+    state = states.get(date_)
+    return state.status if state else None
+
+
+async def poll_day(parser: AsyncParser, date_: date, deadline: datetime) -> bool:
+    delay = config.INGEST_POLL_MIN
+    while True:
+        try:
+            started = perf_counter()
+            stats = await start_async_data_loader(date_, date_, parser=parser)
+            if stats.files and config.METRICS_TEXTFILE:
+                write_metrics(config.METRICS_TEXTFILE, stats, perf_counter() - started)
+            status = await get_status(date_)
+            if status == LOADED:
+                return True
+            if status == REJECTED:
+                print(f'Report for {date_} has no usable data, stop polling')
+                return False
+        except Exception as e:
+            print(f'Error when polling {date_}: {e}')
+
+        now = datetime.now(deadline.tzinfo)
+        if now + timedelta(seconds=delay) > deadline:
+            return False
+        print(f'Report for {date_} is not published yet, retry in {delay:.0f}s')
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, config.INGEST_POLL_MAX)
+
+
+async def run_daemon() -> None:
+    tz = ZoneInfo(config.INGEST_TIMEZONE)
+    publish_at = time.fromisoformat(config.INGEST_TIME)
+    deadline_at = time.fromisoformat(config.INGEST_DEADLINE)
+    calendar = get_calendar()
+
+    print(f'\nDaemon started, polling after {publish_at} ({config.INGEST_TIMEZONE})')
+    async with create_parser(decode_workers=1) as parser:
+        while True:
+            now = datetime.now(tz)
+            today = now.date()
+            start = datetime.combine(today, publish_at, tz)
+            deadline = datetime.combine(today, deadline_at, tz)
+
+            if now >= start:
+                if now < deadline and await get_status(today) not in (LOADED, REJECTED):
+                    # The calendar is only a hint: on a day off the report is
+                    # requested once instead of being polled for.
+                    if not calendar.is_trading_day(today):
+                        deadline = now
+                    loaded = await poll_day(parser, today, deadline)
+                    print(f'Report for {today} ' + ('loaded' if loaded else 'was not published'))
+                today += timedelta(days=1)
+
+            next_run = datetime.combine(today, publish_at, tz)
+            await asyncio.sleep(max(0.0, (next_run - datetime.now(tz)).total_seconds()))
@@ -1,38 +1,125 @@
-from datetime import date
+from datetime import date, timedelta
+from time import perf_counter
 
-from core.database import async_session
-from models import TradingResult
+from core.config import config
+from core.database import async_engine
+from models.ingestion import LOADED
 
+from utils.cache import ReportCache
+from utils.calendar import TradingCalendar, parse_dates
 from utils.parsers import AsyncParser
+from utils.partitions import ensure_partitions, partition_bounds
+from utils.stats import LoaderStats
+from utils.transforms import to_columns
+from utils.writers import (
+    get_ingestion_states,
+    get_writer,
+    notify_day_loaded,
+    refresh_trading_day,
+    refresh_trading_rollups,
+    save_ingestion_state,
+    save_skipped_state,
+)
 
 
-async def start_async_data_loader(start_date: date):
-    parser = AsyncParser()
+def get_calendar() -> TradingCalendar:
+    return TradingCalendar(
+        holidays=parse_dates(config.HOLIDAYS),
+        working_days=parse_dates(config.WORKING_DAYS),
+    )
+
+
+def create_parser(decode_workers: int | None = None) -> AsyncParser:
+    cache = None
+    if config.REPORT_CACHE_DIR:
+        cache = ReportCache(config.REPORT_CACHE_DIR, config.REPORT_CACHE_MAX_BYTES)
+
+    return AsyncParser(
+        cache=cache,
+        concurrency=config.FETCH_CONCURRENCY,
+        retries=config.FETCH_RETRIES,
+        backoff=config.FETCH_BACKOFF,
+        decode_workers=decode_workers or config.DECODE_WORKERS,
+        queue_size=config.PIPELINE_QUEUE_SIZE,
+        base_url=config.REPORT_BASE_URL,
+    )
+
+
+async def start_async_data_loader(
+    start_date: date,
+    end_date: date | None = None,
+    force: bool = False,
+    decode_workers: int | None = None,
+    parser: AsyncParser | None = None,
+) -> LoaderStats:
+    if parser is None:
+        async with create_parser(decode_workers) as parser:
+            return await start_async_data_loader(start_date, end_date, force, parser=parser)
+
+    writer = get_writer(config.LOADER_MODE)
+    stats = parser.stats = LoaderStats()
+    parser.skipped = {}
     success_count = 0
+    unchanged_count = 0
+    partitions = set()
+
+    print(f'\nStart async loader for {start_date}..{end_date or date.today()}')
+
+    states = {}
+    if not force:
+        async with async_engine.connect() as conn:
+            states = await get_ingestion_states(conn, start_date)
+
+    # Reports are republished for a day or two, and a missing one may
+    # still appear, so only older days are skipped.
+    reload_from = date.today() - timedelta(days=config.RELOAD_DAYS)
+    recheck_from = date.today() - timedelta(days=config.MISSING_RECHECK_DAYS)
+    skip_dates = {
+        date_
+        for date_, state in states.items()
+        if date_ < (reload_from if state.status == LOADED else recheck_from)
+    }
+    print(f'Skipping {len(skip_dates)} already loaded or missing days')
+
+    async for df, date_, checksum in parser.parse(start_date, end_date, skip_dates):
+        state = states.get(date_)
+        if state is not None and state.checksum == checksum:
+            unchanged_count += 1
+            continue
+
+        started = perf_counter()
+        try:
+            columns = to_columns(df, date_)
+
+            partition = partition_bounds(date_, config.PARTITION_INTERVAL)[0]
+            if partition not in partitions:
+                async with async_engine.begin() as conn:
+                    await ensure_partitions(conn, {date_}, config.PARTITION_INTERVAL)
+                partitions.add(partition)
+
+            async with async_engine.begin() as conn:
+                await writer(conn, columns)
+                await refresh_trading_day(conn, date_)
+                await refresh_trading_rollups(conn, date_)
+                await save_ingestion_state(conn, date_, len(df), checksum)
+                await notify_day_loaded(conn, date_)
+            success_count += 1
+            stats.files += 1
+            stats.rows += len(df)
+        except Exception as e:
+            print(f'Error in table for {date_}: {e}')
+        finally:
+            stats.insert_time += perf_counter() - started
+
+    if parser.skipped:
+        async with async_engine.begin() as conn:
+            for date_, status in sorted(parser.skipped.items()):
+                await save_skipped_state(conn, date_, status)
+
+    await parser.flush()
 
-    print('\nStart async loader')
-
-    async with async_session() as session:
-        async for df, date_ in parser.parse(start_date):
-            try:
-                for _, row in df.iterrows():
-                    obj = TradingResult(
-                        exchange_product_id=str(row.get('exchange_product_id')),
-                        exchange_product_name=str(row.get('exchange_product_name')),
-                        oil_id=str(row.get('exchange_product_id'))[:4],
-                        delivery_basis_id=str(row.get('exchange_product_id'))[4:7],
-                        delivery_basis_name=str(row.get('delivery_basis_name')),
-                        delivery_type_id=str(row.get('exchange_product_id'))[-1],
-                        volume=int(row.get('volume', 0)),
-                        total=int(row.get('total', 0)),
-                        count=int(row.get('count')),
-                        date=date_,
-                    )
-                    session.add(obj)
-                await session.commit()
-                success_count += 1
-            except Exception:
-                print(f'Error in table for {date_}')
-                await session.rollback()
-
-    print(f'\nSuccessfully loaded {success_count} tables by async loader')
+    print(
+        f'\nSuccessfully loaded {success_count} tables by async loader '
+        f'({unchanged_count} unchanged)'
+    )
+    return stats
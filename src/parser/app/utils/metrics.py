@@ -0,0 +1,24 @@
+from time import time
+
+from prometheus_client import CollectorRegistry, Gauge, write_to_textfile
+
+from utils.stats import LoaderStats
+
+
+def write_metrics(path: str, stats: LoaderStats, elapsed: float) -> None:
+    registry = CollectorRegistry()
+
+    def gauge(name: str, documentation: str, value: float) -> None:
+        Gauge(f'parser_{name}', documentation, registry=registry).set(value)
+
+    gauge('files_loaded', 'Reports loaded by the last run', stats.files)
+    gauge('rows_loaded', 'Rows loaded by the last run', stats.rows)
+    gauge('bytes_downloaded', 'Bytes downloaded by the last run', stats.bytes_downloaded)
+    gauge('fetch_seconds', 'Time spent downloading reports', stats.fetch_time)
+    gauge('decode_seconds', 'Time spent decoding reports', stats.decode_time)
+    gauge('insert_seconds', 'Time spent writing to the database', stats.insert_time)
+    gauge('run_seconds', 'Wall-clock duration of the last run', elapsed)
+    gauge('rows_per_second', 'Rows loaded per second', stats.rows / (elapsed or 1e-9))
+    gauge('last_run_timestamp_seconds', 'Unix time the last run finished', time())
+
+    write_to_textfile(path, registry)
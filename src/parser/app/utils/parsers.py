@@ -1,22 +1,92 @@
 import asyncio
+import hashlib
+import multiprocessing
+import os
+import random
+from concurrent.futures import Executor, ProcessPoolExecutor
 from datetime import date, timedelta
 from io import BytesIO
+from time import perf_counter
 from typing import AsyncGenerator
 from urllib.parse import urljoin
 
 import pandas as pd
-from httpx import AsyncClient
+from httpx import AsyncClient, Response, TransportError
+
+from models.ingestion import MISSING, REJECTED
+from utils.cache import ReportCache
+from utils.stats import LoaderStats
+from utils.transforms import has_metric_ton_unit
+
+COLUMN_MAPPING = {
+    'Код Инструмента': 'exchange_product_id',
+    'Наименование Инструмента': 'exchange_product_name',
+    'Базис поставки': 'delivery_basis_name',
+    'Объем Договоров в единицах измерения': 'volume',
+    'Обьем Договоров, руб.': 'total',
+    'Количество Договоров, шт.': 'count',
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 
 class AsyncParser:
-    def __init__(self):
+    def __init__(
+        self,
+        cache: ReportCache | None = None,
+        concurrency: int = 20,
+        retries: int = 3,
+        backoff: float = 0.5,
+        decode_workers: int | None = None,
+        queue_size: int = 20,
+        base_url: str = 'https://spimex.com',
+    ):
         self.__client = AsyncClient()
-        self.__base_url = 'https://spimex.com'
+        self.__cache = cache
+        self.__concurrency = concurrency
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__decode_workers = decode_workers
+        self.__queue_size = queue_size
+        self.__executor: ProcessPoolExecutor | None = None
+        self.stats = LoaderStats()
+        # Days without a usable report, so they are not requested again.
+        self.skipped: dict[date, str] = {}
+        self.__base_url = base_url
         self.__target_url_sample = '/upload/reports/oil_xls/oil_xls_{}162000.xls'
 
+    async def __aenter__(self) -> 'AsyncParser':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def flush(self) -> None:
+        if self.__cache:
+            await asyncio.to_thread(self.__cache.flush)
+
+    async def aclose(self) -> None:
+        await self.flush()
+        await self.__client.aclose()
+        if self.__executor is not None:
+            self.__executor.shutdown(cancel_futures=True)
+            self.__executor = None
+
+    def _get_executor(self, workers: int) -> Executor:
+        # Spawning decoder processes takes longer than decoding a single
+        # report, so the pool is kept for the parser's lifetime.
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return self.__executor
+
     @staticmethod
-    async def _dates_gen(start_date: date) -> AsyncGenerator[date, None]:
-        end_date = date.today()
+    async def _dates_gen(
+        start_date: date, end_date: date | None = None
+    ) -> AsyncGenerator[date, None]:
+        end_date = end_date or date.today()
         delta = timedelta(days=1)
 
         if start_date > end_date:
@@ -27,89 +97,213 @@ class AsyncParser:
             yield current_date
             current_date += delta
 
-    async def _target_urls_gen(self, start_date: date) -> AsyncGenerator[tuple[str, date], None]:
-        async for date_ in self._dates_gen(start_date):
+    async def _target_urls_gen(
+        self, start_date: date, end_date: date | None, skip_dates: set[date]
+    ) -> AsyncGenerator[tuple[str, date], None]:
+        # Weekends and holidays are requested too: holidays move between
+        # years, and a day without a report is remembered as missing after
+        # its first 404.
+        async for date_ in self._dates_gen(start_date, end_date):
+            if date_ in skip_dates:
+                continue
             date_str = date_.strftime('%Y%m%d')
             yield (
                 urljoin(self.__base_url, self.__target_url_sample.format(date_str)),
                 date_,
             )
 
+    async def _get(self, url: str, headers: dict[str, str] | None = None) -> Response:
+        for attempt in range(self.__retries + 1):
+            delay = self.__backoff * 2**attempt
+            try:
+                response = await self.__client.get(url, headers=headers)
+            except TransportError:
+                if attempt == self.__retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.__retries:
+                    return response
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+
+            await asyncio.sleep(delay + random.uniform(0, self.__backoff))
+
+    async def _download(self, url: str, date_: date) -> bytes | None:
+        # Cache calls touch the disk, so they run in threads to keep the
+        # other downloads going.
+        headers = await asyncio.to_thread(self.__cache.validators, url) if self.__cache else {}
+        response = await self._get(url, headers=headers)
+
+        if response.status_code == 304 and self.__cache:
+            content = await asyncio.to_thread(self.__cache.read, url)
+            if content is not None:
+                return content
+            response = await self._get(url)
+
+        if response.status_code != 200:
+            print(f'Skipped for {url} (HTTP Response: {response.status_code})')
+            if response.status_code == 404:
+                self.skipped[date_] = MISSING
+            return None
+
+        self.stats.bytes_downloaded += len(response.content)
+
+        if self.__cache:
+            await asyncio.to_thread(
+                self.__cache.store,
+                url,
+                response.content,
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+            )
+        return response.content
+
     async def _fetch_excel(
-        self, start_date: date
-    ) -> AsyncGenerator[tuple[pd.DataFrame, date], None]:
-        semaphore = asyncio.Semaphore(20)
+        self,
+        start_date: date,
+        end_date: date | None,
+        skip_dates: set[date],
+        downloads: asyncio.Queue,
+    ) -> None:
+        targets = asyncio.Queue(maxsize=self.__concurrency)
 
-        async def fetch_one(url: str, date_: date) -> tuple[pd.DataFrame, date] | None:
-            async with semaphore:
+        async def produce() -> None:
+            try:
+                async for target in self._target_urls_gen(start_date, end_date, skip_dates):
+                    await targets.put(target)
+            finally:
+                if not asyncio.current_task().cancelling():
+                    for _ in range(self.__concurrency):
+                        await targets.put(None)
+
+        async def fetch_worker() -> None:
+            while (target := await targets.get()) is not None:
+                url, date_ = target
+                started = perf_counter()
                 try:
-                    response = await self.__client.get(url)
-                    if response.status_code == 200:
-                        excel_bytes = response.content
-                        df = pd.read_excel(BytesIO(excel_bytes))
-                        return (df, date_)
-                    else:
-                        print(f'Skipped for {date_} (HTTP Response: {response.status_code})')
+                    excel_bytes = await self._download(url, date_)
                 except Exception as e:
-                    print(f'Error when parsing {url}: {e}')
+                    print(f'Error when downloading {url}: {e}')
+                    continue
+                finally:
+                    self.stats.fetch_time += perf_counter() - started
+                if excel_bytes is not None:
+                    checksum = hashlib.sha256(excel_bytes).hexdigest()
+                    await downloads.put((excel_bytes, date_, checksum))
+
+        workers = [asyncio.create_task(fetch_worker()) for _ in range(self.__concurrency)]
+        try:
+            await produce()
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    @staticmethod
+    def _check_df(df: pd.DataFrame) -> bool:
+        return has_metric_ton_unit(df)
+
+    @staticmethod
+    def _decode(excel_bytes: bytes) -> pd.DataFrame | None:
+        df = pd.read_excel(BytesIO(excel_bytes))
+        if not AsyncParser._check_df(df):
             return None
 
-        tasks = []
-        async for url, date_ in self._target_urls_gen(start_date):
-            tasks.append(fetch_one(url, date_))
-
-        for coro in asyncio.as_completed(tasks):
-            result = await coro
-            if result is not None:
-                yield result
-
-    def _check_df(self, df: pd.DataFrame) -> bool:
-        check_str = 'Единица измерения: Метрическая тонна'
-        df_str = df.astype(str)
-        if not df_str.map(lambda cell: check_str in cell).any().any():
-            return False
-        return True
-
-    async def parse(self, start_date: date) -> AsyncGenerator[tuple[pd.DataFrame, date], None]:
-        column_mapping = {
-            'Код Инструмента': 'exchange_product_id',
-            'Наименование Инструмента': 'exchange_product_name',
-            'Базис поставки': 'delivery_basis_name',
-            'Объем Договоров в единицах измерения': 'volume',
-            'Обьем Договоров, руб.': 'total',
-            'Количество Договоров, шт.': 'count',
-        }
-
-        async for df, date_ in self._fetch_excel(start_date):
-            if not self._check_df(df):
-                print(f'Skipped for {date_}')
-                continue
+        df_slice = df.iloc[5:, 1:].dropna(how='all')
+        df_slice.columns = (
+            df_slice.iloc[0].astype(str).str.replace('\n', ' ', regex=False).str.strip()
+        )
+        df_slice = df_slice[1:]
 
-            df_slice = df.iloc[5:, 1:].dropna(how='all')
-            df_slice.columns = (
-                df_slice.iloc[0].astype(str).str.replace('\n', ' ', regex=False).str.strip()
-            )
-            df_slice = df_slice[1:]
+        first_column = df_slice.columns[0]
+        df_slice = df_slice[
+            ~df_slice[first_column].astype(str).str.contains('Итого', case=False, na=False)
+        ]
 
-            first_column = df_slice.columns[0]
-            df_slice = df_slice[
-                ~df_slice[first_column].astype(str).str.contains('Итого', case=False, na=False)
-            ]
+        df_slice = df_slice[list(COLUMN_MAPPING.keys())]
+        df_slice = df_slice.rename(columns=COLUMN_MAPPING)
 
-            try:
-                df_slice = df_slice[list(column_mapping.keys())]
-                df_slice = df_slice.rename(columns=column_mapping)
+        filter_column_name = 'count'
+        df_slice[filter_column_name] = pd.to_numeric(
+            df_slice[filter_column_name],
+            errors='coerce',
+        )
+
+        df_slice = df_slice[df_slice[filter_column_name] > 0]
+        return df_slice.reset_index(drop=True)
 
-                filter_column_name = 'count'
-                df_slice[filter_column_name] = pd.to_numeric(
-                    df_slice[filter_column_name],
-                    errors='coerce',
-                )
+    @staticmethod
+    def _timed_decode(excel_bytes: bytes) -> tuple[pd.DataFrame | None, float]:
+        started = perf_counter()
+        df = AsyncParser._decode(excel_bytes)
+        return df, perf_counter() - started
+
+    async def _decode_worker(
+        self, executor: Executor, downloads: asyncio.Queue, results: asyncio.Queue
+    ) -> None:
+        loop = asyncio.get_running_loop()
 
-                df_slice = df_slice[df_slice[filter_column_name] > 0]
-                df_slice = df_slice.reset_index(drop=True)
+        while (item := await downloads.get()) is not None:
+            excel_bytes, date_, checksum = item
+            try:
+                df, elapsed = await loop.run_in_executor(executor, self._timed_decode, excel_bytes)
+                self.stats.decode_time += elapsed
             except KeyError as e:
                 print(f'Error when filter {date_}: {e}')
+                self.skipped[date_] = REJECTED
                 continue
+            except Exception as e:
+                print(f'Error when parsing {date_}: {e}')
+                continue
+
+            if df is None:
+                print(f'Skipped for {date_}')
+                self.skipped[date_] = REJECTED
+                continue
+            await results.put((df, date_, checksum))
+
+        await results.put(None)
+
+    async def parse(
+        self,
+        start_date: date,
+        end_date: date | None = None,
+        skip_dates: set[date] | None = None,
+    ) -> AsyncGenerator[tuple[pd.DataFrame, date, str], None]:
+        downloads = asyncio.Queue(maxsize=self.__queue_size)
+        results = asyncio.Queue(maxsize=self.__queue_size)
+
+        decoders_count = self.__decode_workers or os.cpu_count() or 1
+        executor = self._get_executor(decoders_count)
+
+        async def download_stage() -> None:
+            try:
+                await self._fetch_excel(start_date, end_date, skip_dates or set(), downloads)
+            finally:
+                # Once cancelled the decoders are being cancelled as well and
+                # nobody drains the queue, so waiting for free slots would hang.
+                if not asyncio.current_task().cancelling():
+                    for _ in range(decoders_count):
+                        await downloads.put(None)
+
+        tasks = [asyncio.create_task(download_stage())]
+        tasks += [
+            asyncio.create_task(self._decode_worker(executor, downloads, results))
+            for _ in range(decoders_count)
+        ]
+
+        try:
+            finished_decoders = 0
+            while finished_decoders < decoders_count:
+                item = await results.get()
+                if item is None:
+                    finished_decoders += 1
+                    continue
+                yield item
 
-            yield (df_slice, date_)
+            await tasks[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,90 @@
+import re
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+PARENT_TABLE = 'trading_results'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+PARTITION_LOCK_ID = 7_312_026
+
+NAME_FORMATS = {'month': '%Y_%m', 'year': '%Y'}
+BOUNDS = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+DETACHED_SUFFIX = '_detached'
+
+
+def partition_bounds(date_: date, interval: str) -> tuple[str, date, date]:
+    if interval not in NAME_FORMATS:
+        raise ValueError(f'Unknown partition interval: {interval}')
+
+    if interval == 'month':
+        start = date_.replace(day=1)
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    else:
+        start = date(date_.year, 1, 1)
+        end = date(date_.year + 1, 1, 1)
+    return f'{PARENT_TABLE}_p{start.strftime(NAME_FORMATS[interval])}', start, end
+
+
+async def get_partitions(conn: AsyncConnection) -> dict[str, str]:
+    result = await conn.execute(
+        text(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) '
+            'FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = CAST(:parent AS regclass)'
+        ),
+        {'parent': PARENT_TABLE},
+    )
+    return dict(result.all())
+
+
+async def ensure_partitions(conn: AsyncConnection, dates: set[date], interval: str) -> list[str]:
+    existing = await get_partitions(conn)
+    missing = {partition_bounds(date_, interval) for date_ in dates}
+    missing = sorted(bounds for bounds in missing if bounds[0] not in existing)
+    if not missing:
+        return []
+
+    # Shards may race for the same month; creating a partition also locks
+    # the parent table, so it is done in a short transaction of its own.
+    await conn.execute(
+        text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': PARTITION_LOCK_ID}
+    )
+    existing = await get_partitions(conn)
+
+    created = []
+    for name, start, end in missing:
+        if name in existing:
+            continue
+        await conn.execute(
+            text(
+                f'CREATE TABLE {name} PARTITION OF {PARENT_TABLE} '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+        created.append(name)
+    return created
+
+
+async def detach_partitions(conn: AsyncConnection, before: date) -> list[tuple[str, date, date]]:
+    detached = []
+    for name, bound in sorted((await get_partitions(conn)).items()):
+        match = BOUNDS.search(bound)
+        if match is None:
+            continue
+        start, end = map(date.fromisoformat, match.groups())
+        if end > before:
+            continue
+
+        # The table keeps its data but gives up the name, so loading the
+        # period again creates a fresh partition instead of failing.
+        new_name = f'{name}{DETACHED_SUFFIX}'
+        suffix = 1
+        while await conn.scalar(text('SELECT to_regclass(:name)'), {'name': new_name}):
+            suffix += 1
+            new_name = f'{name}{DETACHED_SUFFIX}{suffix}'
+
+        await conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}'))
+        await conn.execute(text(f'ALTER TABLE {name} RENAME TO {new_name}'))
+        detached.append((new_name, start, end))
+    return detached
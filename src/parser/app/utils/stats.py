@@ -0,0 +1,26 @@
+from dataclasses import dataclass, fields
+
+
+@dataclass
+class LoaderStats:
+    files: int = 0
+    rows: int = 0
+    bytes_downloaded: int = 0
+    fetch_time: float = 0.0
+    decode_time: float = 0.0
+    insert_time: float = 0.0
+
+    def merge(self, other: 'LoaderStats') -> None:
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+
+    def report(self, elapsed: float) -> str:
+        elapsed = elapsed or 1e-9
+        return (
+            f'files: {self.files} ({self.files / elapsed:.2f} files/s), '
+            f'rows: {self.rows} ({self.rows / elapsed:.0f} rows/s), '
+            f'downloaded: {self.bytes_downloaded / 1024 / 1024:.2f} MiB, '
+            f'fetch: {self.fetch_time:.2f}s, '
+            f'decode: {self.decode_time:.2f}s, '
+            f'insert: {self.insert_time:.2f}s'
+        )
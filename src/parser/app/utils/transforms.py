@@ -0,0 +1,31 @@
+from datetime import date
+
+import pandas as pd
+
+CHECK_STR = 'Единица измерения: Метрическая тонна'
+CHECK_ROWS = 10
+
+NUMERIC_COLUMNS = ('volume', 'total', 'count')
+
+
+def has_metric_ton_unit(df: pd.DataFrame) -> bool:
+    header = df.head(CHECK_ROWS).to_numpy(dtype=object).ravel()
+    return any(isinstance(cell, str) and CHECK_STR in cell for cell in header)
+
+
+def to_columns(df: pd.DataFrame, date_: date) -> dict[str, list]:
+    product_ids = df['exchange_product_id'].astype(str)
+
+    columns = {
+        'exchange_product_id': product_ids.tolist(),
+        'exchange_product_name': df['exchange_product_name'].astype(str).tolist(),
+        'oil_id': product_ids.str[:4].tolist(),
+        'delivery_basis_id': product_ids.str[4:7].tolist(),
+        'delivery_basis_name': df['delivery_basis_name'].astype(str).tolist(),
+        'delivery_type_id': product_ids.str[-1].tolist(),
+    }
+    for column in NUMERIC_COLUMNS:
+        columns[column] = pd.to_numeric(df[column]).astype('int64').tolist()
+    columns['date'] = [date_] * len(df)
+
+    return columns
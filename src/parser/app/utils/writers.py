@@ -0,0 +1,207 @@
+from datetime import date
+from typing import Awaitable, Callable
+
+from core.config import config
+from models import IngestionState, TradingResult
+from models.ingestion import LOADED
+from sqlalchemy import Row, delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+COLUMNS = (
+    'exchange_product_id',
+    'exchange_product_name',
+    'oil_id',
+    'delivery_basis_id',
+    'delivery_basis_name',
+    'delivery_type_id',
+    'volume',
+    'total',
+    'count',
+    'date',
+)
+CONFLICT_COLUMNS = ('exchange_product_id', 'date')
+UPDATE_COLUMNS = tuple(column for column in COLUMNS if column not in CONFLICT_COLUMNS)
+
+STAGING_TABLE = 'trading_results_staging'
+TRADING_DAY_CHANNEL = 'trading_day_loaded'
+
+Writer = Callable[[AsyncConnection, dict[str, list]], Awaitable[int]]
+
+
+def _records(columns: dict[str, list]) -> list[tuple]:
+    return list(zip(*(columns[column] for column in COLUMNS)))
+
+
+async def copy_trading_results(conn: AsyncConnection, columns: dict[str, list]) -> int:
+    column_list = ', '.join(COLUMNS)
+    conflict_list = ', '.join(CONFLICT_COLUMNS)
+    update_list = ', '.join(f'{column} = EXCLUDED.{column}' for column in UPDATE_COLUMNS)
+
+    await conn.execute(
+        text(
+            f'CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS '
+            f'SELECT {column_list} FROM trading_results WITH NO DATA'
+        )
+    )
+
+    raw_connection = await conn.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        STAGING_TABLE,
+        records=_records(columns),
+        columns=COLUMNS,
+    )
+
+    result = await conn.execute(
+        text(
+            f'INSERT INTO trading_results ({column_list}) '
+            f'SELECT DISTINCT ON ({conflict_list}) {column_list} FROM {STAGING_TABLE} '
+            f'ON CONFLICT ({conflict_list}) DO UPDATE SET {update_list}, updated_ap = now()'
+        )
+    )
+
+    await conn.execute(
+        text(
+            f'DELETE FROM trading_results t '
+            f'WHERE t.date IN (SELECT DISTINCT date FROM {STAGING_TABLE}) '
+            f'AND NOT EXISTS (SELECT 1 FROM {STAGING_TABLE} s '
+            f'WHERE s.exchange_product_id = t.exchange_product_id AND s.date = t.date)'
+        )
+    )
+    return result.rowcount
+
+
+async def insert_trading_results(conn: AsyncConnection, columns: dict[str, list]) -> int:
+    rows = {}
+    for record in _records(columns):
+        row = dict(zip(COLUMNS, record))
+        rows[tuple(row[column] for column in CONFLICT_COLUMNS)] = row
+    rows = list(rows.values())
+
+    inserted = 0
+    for start in range(0, len(rows), config.LOADER_BATCH_SIZE):
+        stmt = insert(TradingResult).values(rows[start : start + config.LOADER_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=CONFLICT_COLUMNS,
+            set_={column: stmt.excluded[column] for column in UPDATE_COLUMNS}
+            | {'updated_ap': func.now()},
+        )
+        result = await conn.execute(stmt)
+        inserted += result.rowcount
+
+    for date_ in set(columns['date']):
+        product_ids = [row['exchange_product_id'] for row in rows if row['date'] == date_]
+        await conn.execute(
+            delete(TradingResult).where(
+                TradingResult.date == date_,
+                TradingResult.exchange_product_id.not_in(product_ids),
+            )
+        )
+    return inserted
+
+
+async def get_ingestion_states(conn: AsyncConnection, start_date: date) -> dict[date, Row]:
+    result = await conn.execute(
+        select(IngestionState.date, IngestionState.status, IngestionState.checksum).where(
+            IngestionState.date >= start_date
+        )
+    )
+    return {row.date: row for row in result.all()}
+
+
+async def save_ingestion_state(
+    conn: AsyncConnection, date_: date, rows_count: int, checksum: str
+) -> None:
+    stmt = insert(IngestionState).values(
+        date=date_, rows_count=rows_count, checksum=checksum, status=LOADED
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['date'],
+        set_={
+            'rows_count': stmt.excluded.rows_count,
+            'checksum': stmt.excluded.checksum,
+            'status': stmt.excluded.status,
+            'updated_ap': func.now(),
+        },
+    )
+    await conn.execute(stmt)
+
+
+async def save_skipped_state(conn: AsyncConnection, date_: date, status: str) -> None:
+    stmt = insert(IngestionState).values(date=date_, rows_count=0, checksum='', status=status)
+    # A report that disappears or breaks later does not erase a loaded day.
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['date'],
+        set_={'status': stmt.excluded.status, 'updated_ap': func.now()},
+        where=IngestionState.status != LOADED,
+    )
+    await conn.execute(stmt)
+
+
+async def refresh_trading_day(conn: AsyncConnection, date_: date) -> None:
+    await conn.execute(
+        text(
+            'INSERT INTO trading_days (date, rows_count, volume, total) '
+            'SELECT CAST(:date AS date), count(*), '
+            'coalesce(sum(volume), 0), coalesce(sum(total), 0) '
+            'FROM trading_results WHERE date = :date '
+            'ON CONFLICT (date) DO UPDATE SET rows_count = EXCLUDED.rows_count, '
+            'volume = EXCLUDED.volume, total = EXCLUDED.total, updated_ap = now()'
+        ),
+        {'date': date_},
+    )
+
+
+async def refresh_trading_rollups(conn: AsyncConnection, date_: date) -> None:
+    await conn.execute(text('DELETE FROM trading_rollups WHERE date = :date'), {'date': date_})
+    await conn.execute(
+        text(
+            'INSERT INTO trading_rollups (date, dimension, value, volume, total, count) '
+            'SELECT date, dimension, value, sum(volume), sum(total), sum(count) '
+            'FROM trading_results, LATERAL (VALUES '
+            "('oil_id', oil_id), "
+            "('delivery_basis_id', delivery_basis_id), "
+            "('delivery_type_id', delivery_type_id)"
+            ') AS dimensions (dimension, value) '
+            'WHERE date = :date '
+            'GROUP BY date, dimension, value'
+        ),
+        {'date': date_},
+    )
+
+
+async def delete_days(conn: AsyncConnection, start_date: date, end_date: date) -> list[date]:
+    params = {'start_date': start_date, 'end_date': end_date}
+    result = await conn.scalars(
+        text(
+            'DELETE FROM trading_days WHERE date >= :start_date AND date < :end_date RETURNING date'
+        ),
+        params,
+    )
+    await conn.execute(
+        text('DELETE FROM trading_rollups WHERE date >= :start_date AND date < :end_date'),
+        params,
+    )
+    # ingestion_states is kept, otherwise the next run would download the
+    # detached days again and recreate their partitions.
+    return sorted(result.all())
+
+
+async def notify_day_loaded(conn: AsyncConnection, date_: date) -> None:
+    await conn.execute(
+        text('SELECT pg_notify(:channel, :payload)'),
+        {'channel': TRADING_DAY_CHANNEL, 'payload': date_.isoformat()},
+    )
+
+
+WRITERS: dict[str, Writer] = {
+    'copy': copy_trading_results,
+    'insert': insert_trading_results,
+}
+
+
+def get_writer(mode: str) -> Writer:
+    try:
+        return WRITERS[mode]
+    except KeyError:
+        raise ValueError(f'Unknown loader mode: {mode}. Expected one of: {", ".join(WRITERS)}')
@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+from datetime import date, datetime, timedelta
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'app'))
+
+REPORT_PATH = '/upload/reports/oil_xls/'
+REPORT_NAME = re.compile(r'oil_xls_(\d{8})162000\.xls')
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def translate_path(self, path: str) -> str:
+        return str(Path(self.directory) / Path(path.split('?')[0]).name)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(fixtures: Path) -> tuple[ThreadingHTTPServer, str]:
+    handler = partial(QuietHandler, directory=str(fixtures))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def fixture_dates(fixtures: Path) -> list[date]:
+    dates = []
+    for path in fixtures.glob('oil_xls_*.xls'):
+        match = REPORT_NAME.fullmatch(path.name)
+        if match:
+            dates.append(datetime.strptime(match[1], '%Y%m%d').date())
+    return sorted(dates)
+
+
+async def record(fixtures: Path, start_date: date, end_date: date) -> int:
+    fixtures.mkdir(parents=True, exist_ok=True)
+    recorded = 0
+    async with httpx.AsyncClient(base_url='https://spimex.com') as client:
+        date_ = start_date
+        while date_ <= end_date:
+            name = f'oil_xls_{date_:%Y%m%d}162000.xls'
+            response = await client.get(REPORT_PATH + name)
+            if response.status_code == 200:
+                (fixtures / name).write_bytes(response.content)
+                recorded += 1
+            date_ += timedelta(days=1)
+    return recorded
+
+
+def result(stats, elapsed: float) -> dict:
+    return {
+        'files': stats.files,
+        'rows': stats.rows,
+        'elapsed_s': round(elapsed, 3),
+        'files_per_s': round(stats.files / elapsed, 2),
+        'rows_per_s': round(stats.rows / elapsed),
+        'mib_per_s': round(stats.bytes_downloaded / 1024 / 1024 / elapsed, 2),
+        'fetch_s': round(stats.fetch_time, 3),
+        'decode_s': round(stats.decode_time, 3),
+        'insert_s': round(stats.insert_time, 3),
+    }
+
+
+async def bench_parse(start_date: date, end_date: date, repeats: int) -> list[dict]:
+    from core.config import config
+    from utils.parsers import AsyncParser
+
+    runs = []
+    for _ in range(repeats):
+        parser = AsyncParser(
+            concurrency=config.FETCH_CONCURRENCY,
+            decode_workers=config.DECODE_WORKERS,
+            queue_size=config.PIPELINE_QUEUE_SIZE,
+            base_url=config.REPORT_BASE_URL,
+        )
+        async with parser:
+            started = perf_counter()
+            async for df, _, _ in parser.parse(start_date, end_date):
+                parser.stats.files += 1
+                parser.stats.rows += len(df)
+            runs.append(result(parser.stats, perf_counter() - started))
+    return runs
+
+
+async def bench_load(start_date: date, end_date: date, repeats: int) -> list[dict]:
+    from core.database import async_engine, init_models
+    from utils.loaders import start_async_data_loader
+
+    await init_models()
+    runs = []
+    for _ in range(repeats):
+        started = perf_counter()
+        stats = await start_async_data_loader(start_date, end_date, force=True)
+        runs.append(result(stats, perf_counter() - started))
+    await async_engine.dispose()
+    return runs
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Benchmark the parser against recorded reports.')
+    parser.add_argument('--fixtures', type=Path, default=FIXTURES_DIR)
+    parser.add_argument('--mode', choices=('parse', 'load'), default='parse')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--record', action='store_true', help='download reports into --fixtures')
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2025, 1, 1))
+    parser.add_argument('--end', type=date.fromisoformat, default=date(2025, 3, 31))
+    args = parser.parse_args()
+
+    if args.record:
+        recorded = await record(args.fixtures, args.start, args.end)
+        print(f'Recorded {recorded} reports into {args.fixtures}', file=sys.stderr)
+
+    dates = fixture_dates(args.fixtures)
+    if not dates:
+        raise SystemExit(f'No reports in {args.fixtures}, run with --record first')
+
+    server, base_url = start_server(args.fixtures)
+    os.environ['REPORT_BASE_URL'] = base_url
+    os.environ['REPORT_CACHE_DIR'] = ''
+
+    bench = bench_parse if args.mode == 'parse' else bench_load
+    print(f'{args.mode}: {len(dates)} reports from {base_url}', file=sys.stderr)
+    runs = await bench(dates[0], dates[-1], args.repeats)
+    server.shutdown()
+
+    print(
+        json.dumps(
+            {
+                'mode': args.mode,
+                'reports': len(dates),
+                'runs': runs,
+                'best': max(runs, key=lambda run: run['rows_per_s']),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+import random
+import sys
+from datetime import date
+from pathlib import Path
+from time import perf_counter
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'app'))
+
+from utils.transforms import CHECK_STR, has_metric_ton_unit, to_columns  # noqa: E402
+
+ROWS = 500
+REPEATS = 50
+REPORT_DATE = date(2025, 1, 15)
+
+
+def make_report(rows: int) -> pd.DataFrame:
+    rng = random.Random(0)
+    oil_ids = ['A100', 'A592', 'A95E', 'DSC5', 'PBTK', 'SPBT']
+    bases = [('ANK', 'Ангарск-группа станций'), ('NVY', 'Новоярославская'), ('UFM', 'Уфа')]
+
+    data = []
+    for i in range(rows):
+        basis_id, basis_name = rng.choice(bases)
+        volume = rng.randint(60, 6000)
+        data.append(
+            {
+                'exchange_product_id': f'{rng.choice(oil_ids)}{basis_id}{i % 1000:03d}F',
+                'exchange_product_name': f'Бензин (АИ-92-К5) {basis_name}',
+                'delivery_basis_name': basis_name,
+                'volume': str(volume),
+                'total': str(volume * rng.randint(50000, 70000)),
+                'count': float(rng.randint(1, 30)),
+            }
+        )
+    return pd.DataFrame(data)
+
+
+def make_sheet(rows: int) -> pd.DataFrame:
+    sheet = pd.DataFrame([[None] * 15 for _ in range(rows + 8)], dtype=object)
+    sheet.iat[2, 1] = CHECK_STR
+    for i in range(8, rows + 8):
+        for j in range(1, 15):
+            sheet.iat[i, j] = f'cell {i}:{j}'
+    return sheet
+
+
+def legacy_to_records(df: pd.DataFrame, date_: date) -> list[dict]:
+    records = []
+    for _, row in df.iterrows():
+        records.append(
+            {
+                'exchange_product_id': str(row.get('exchange_product_id')),
+                'exchange_product_name': str(row.get('exchange_product_name')),
+                'oil_id': str(row.get('exchange_product_id'))[:4],
+                'delivery_basis_id': str(row.get('exchange_product_id'))[4:7],
+                'delivery_basis_name': str(row.get('delivery_basis_name')),
+                'delivery_type_id': str(row.get('exchange_product_id'))[-1],
+                'volume': int(row.get('volume', 0)),
+                'total': int(row.get('total', 0)),
+                'count': int(row.get('count')),
+                'date': date_,
+            }
+        )
+    return records
+
+
+def legacy_check_df(df: pd.DataFrame) -> bool:
+    df_str = df.astype(str)
+    return bool(df_str.map(lambda cell: CHECK_STR in cell).any().any())
+
+
+def measure(name: str, func, rows: int) -> float:
+    started = perf_counter()
+    for _ in range(REPEATS):
+        func()
+    elapsed = (perf_counter() - started) / REPEATS
+    print(f'{name:<24} {elapsed * 1000:9.3f} ms  {rows / elapsed:14,.0f} rows/s')
+    return elapsed
+
+
+def main():
+    report = make_report(ROWS)
+    sheet = make_sheet(ROWS)
+
+    print(f'{ROWS}-row report, {REPEATS} repeats\n')
+
+    legacy = measure('legacy transform', lambda: legacy_to_records(report, REPORT_DATE), ROWS)
+    vectorized = measure('vectorized transform', lambda: to_columns(report, REPORT_DATE), ROWS)
+    print(f'speedup: {legacy / vectorized:.1f}x\n')
+
+    legacy = measure('legacy check', lambda: legacy_check_df(sheet), ROWS)
+    header = measure('header-only check', lambda: has_metric_ton_unit(sheet), ROWS)
+    print(f'speedup: {legacy / header:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,61 +1,228 @@
+import asyncio
+import logging
 from datetime import date
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 
-from app.schemas.trading import DateSchema, TradingSchema
-from app.services.trading import TradingService, get_trading_service
+from app.core.config import config
+from app.core.database import session_factory
+from app.schemas.trading import (
+    DateSchema,
+    DynamicsSchema,
+    ExportFormat,
+    GroupBy,
+    Period,
+    TradingPageSchema,
+    TradingSchema,
+)
+from app.services.trading import (
+    TRADING_COLUMNS,
+    TradingService,
+    get_trading_service,
+    trades_adapter,
+)
+from app.utils.cache import cached_response, popular_arguments, response_entry
+from app.utils.export import MEDIA_TYPES, encode_rows
+from app.utils.pagination import decode_cursor
 
 trading_router = APIRouter(prefix='/trading', tags=['trading'])
 
+logger = logging.getLogger(__name__)
 
-@trading_router.get('/dates')
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+dates_adapter = TypeAdapter(list[DateSchema])
+dynamics_adapter = TypeAdapter(list[DynamicsSchema])
+
+
+def serialize_dates(dates: list[DateSchema]) -> tuple[bytes, dict[str, str]]:
+    return dates_adapter.dump_json(dates, exclude_none=True), {}
+
+
+def serialize_dynamics(dynamics: list[DynamicsSchema]) -> tuple[bytes, dict[str, str]]:
+    return dynamics_adapter.dump_json(dynamics), {}
+
+
+def serialize_page(page: TradingPageSchema) -> tuple[bytes, dict[str, str]]:
+    headers = {}
+    if page.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return trades_adapter.dump_json(page.items), headers
+
+
+def validate_cursor(cursor: str | None) -> None:
+    # Checked before the cache, so a malformed cursor never takes the
+    # single-flight lock.
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+DEFAULT_PAGE = {'limit': 200, 'offset': 0, 'cursor': None}
+DEFAULT_FILTERS = {'oil_id': None, 'delivery_type_id': None, 'delivery_basis_id': None}
+
+WARMUP_TARGETS = (
+    ('get_dates', serialize_dates, {'limit': 200, 'offset': 0, 'with_stats': False}),
+    ('get_last_trades_page', serialize_page, DEFAULT_PAGE | DEFAULT_FILTERS),
+    ('get_range_trades_page', serialize_page, None),
+    ('get_dynamics', serialize_dynamics, None),
+)
+
+# Shared by overlapping warm-ups, so together they stay within the limit.
+warmup_semaphore = asyncio.Semaphore(config.WARMUP_CONCURRENCY)
+
+
+async def warm_trading_cache(top: int | None = None) -> int:
+    top = config.WARMUP_TOP if top is None else top
+
+    calls = []
+    for name, serialize, defaults in WARMUP_TARGETS:
+        method = getattr(TradingService, name)
+        popular = await popular_arguments(method, top) if top else []
+        if defaults is not None and defaults not in popular:
+            popular.insert(0, defaults)
+        calls += [(name, serialize, arguments) for arguments in popular]
+
+    async def warm(name: str, serialize, arguments: dict) -> bool:
+        async with warmup_semaphore:
+            # Warmed entries outlive the replica lag, so they are read from
+            # the primary.
+            service = TradingService(session_factory=session_factory)
+            try:
+                await response_entry(getattr(service, name), serialize, track=False, **arguments)
+                return True
+            except Exception as e:
+                logger.warning('Cache warm-up failed for %s(%s): %s', name, arguments, e)
+                return False
+            finally:
+                await service.close()
+
+    results = await asyncio.gather(*(warm(*call) for call in calls))
+    return sum(results)
+
+
+@trading_router.get('/dates', response_model=list[DateSchema], response_model_exclude_none=True)
 async def get_last_trading_dates(
+    request: Request,
     service: Annotated[TradingService, Depends(get_trading_service)],
     limit: Annotated[int, Query(ge=0, le=200)] = 200,
     offset: Annotated[int, Query(ge=0)] = 0,
-) -> list[DateSchema]:
-    dates = await service.get_dates(limit=limit, offset=offset)
-    return dates
+    with_stats: Annotated[bool, Query()] = False,
+) -> Response:
+    return await cached_response(
+        request,
+        service.get_dates,
+        serialize_dates,
+        limit=limit,
+        offset=offset,
+        with_stats=with_stats,
+    )
 
 
-@trading_router.get('/last-trades')
+@trading_router.get('/last-trades', response_model=list[TradingSchema])
 async def get_trading_results(
+    request: Request,
     service: Annotated[TradingService, Depends(get_trading_service)],
     limit: Annotated[int, Query(ge=0, le=200)] = 200,
     offset: Annotated[int, Query(ge=0)] = 0,
+    cursor: Annotated[str | None, Query()] = None,
     oil_id: Annotated[str | None, Query()] = None,
     delivery_type_id: Annotated[str | None, Query()] = None,
     delivery_basis_id: Annotated[str | None, Query()] = None,
-) -> list[TradingSchema]:
-    trades = await service.get_last_trades(
+) -> Response:
+    validate_cursor(cursor)
+    return await cached_response(
+        request,
+        service.get_last_trades_page,
+        serialize_page,
         limit=limit,
         offset=offset,
+        cursor=cursor,
         oil_id=oil_id,
         delivery_type_id=delivery_type_id,
         delivery_basis_id=delivery_basis_id,
     )
-    return trades
 
 
-@trading_router.get('/range-trades')
+@trading_router.get('/range-trades', response_model=list[TradingSchema])
 async def get_dynamics(
+    request: Request,
     service: Annotated[TradingService, Depends(get_trading_service)],
     limit: Annotated[int, Query(ge=0, le=200)] = 200,
     offset: Annotated[int, Query(ge=0)] = 0,
+    cursor: Annotated[str | None, Query()] = None,
     oil_id: Annotated[str | None, Query()] = None,
     delivery_type_id: Annotated[str | None, Query()] = None,
     delivery_basis_id: Annotated[str | None, Query()] = None,
     start_date: Annotated[date | None, Query()] = None,
     end_date: Annotated[date | None, Query()] = None,
-) -> list[TradingSchema]:
-    trades = await service.get_range_trades(
+) -> Response:
+    validate_cursor(cursor)
+    return await cached_response(
+        request,
+        service.get_range_trades_page,
+        serialize_page,
         limit=limit,
         offset=offset,
+        cursor=cursor,
         oil_id=oil_id,
         delivery_type_id=delivery_type_id,
         delivery_basis_id=delivery_basis_id,
         start_date=start_date,
         end_date=end_date,
     )
-    return trades
+
+
+@trading_router.get('/dynamics', response_model=list[DynamicsSchema])
+async def get_aggregated_dynamics(
+    request: Request,
+    service: Annotated[TradingService, Depends(get_trading_service)],
+    group_by: Annotated[GroupBy, Query()] = GroupBy.OIL_ID,
+    period: Annotated[Period, Query()] = Period.DAY,
+    group: Annotated[str | None, Query()] = None,
+    start_date: Annotated[date | None, Query()] = None,
+    end_date: Annotated[date | None, Query()] = None,
+) -> Response:
+    return await cached_response(
+        request,
+        service.get_dynamics,
+        serialize_dynamics,
+        group_by=group_by,
+        period=period,
+        start_date=start_date,
+        end_date=end_date,
+        group=group,
+    )
+
+
+@trading_router.get('/export', response_class=StreamingResponse)
+async def export_trades(
+    service: Annotated[TradingService, Depends(get_trading_service)],
+    export_format: Annotated[ExportFormat, Query(alias='format')] = ExportFormat.NDJSON,
+    oil_id: Annotated[str | None, Query()] = None,
+    delivery_type_id: Annotated[str | None, Query()] = None,
+    delivery_basis_id: Annotated[str | None, Query()] = None,
+    start_date: Annotated[date | None, Query()] = None,
+    end_date: Annotated[date | None, Query()] = None,
+) -> StreamingResponse:
+    chunks = service.stream_trades(
+        oil_id=oil_id,
+        delivery_type_id=delivery_type_id,
+        delivery_basis_id=delivery_basis_id,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    columns = [column.key for column in TRADING_COLUMNS]
+
+    return StreamingResponse(
+        encode_rows(export_format, columns, chunks),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="trading_results.{export_format.value}"'
+        },
+    )
@@ -14,11 +14,41 @@ class Config(BaseSettings):
     DB_NAME: str = Field(alias='DB_NAME')
     DB_USER: str = Field(alias='DB_USER')
     DB_PASS: str = Field(alias='DB_PASS')
+    DB_REPLICA_HOST: str | None = None
+    DB_REPLICA_PORT: str | None = None
+    DB_REPLICA_MAX_LAG: float = 30
+
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10
+    DB_POOL_RECYCLE: int = 60 * 30
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 256
+
+    CACHE_L1_SIZE: int = 1024
+    CACHE_L1_TTL: int = 60
+    CACHE_COMPRESS_MIN_SIZE: int = 1024
+
+    WARMUP_ENABLED: bool = True
+    WARMUP_TOP: int = 20
+    WARMUP_CONCURRENCY: int = 4
+    WARMUP_TIMEOUT: float = 30
 
     @property
     def DB_URL(self) -> str:
         return f'postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
 
+    @property
+    def DB_REPLICA_URL(self) -> str | None:
+        if not self.DB_REPLICA_HOST:
+            return None
+        port = self.DB_REPLICA_PORT or self.DB_PORT
+        return f'postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_REPLICA_HOST}:{port}/{self.DB_NAME}'
+
+    @property
+    def LISTEN_DB_URL(self) -> str:
+        return f'postgresql://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
+
 
 @lru_cache
 def get_config() -> Config:
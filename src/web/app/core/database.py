@@ -1,13 +1,58 @@
-from typing import AsyncGenerator
+from time import time
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
 from app.core.config import config
+from app.utils.metrics import TimedQueuePool, instrument_engine
+
+
+def create_engine(url: str, name: str) -> AsyncEngine:
+    # SQLAlchemy keeps its own prepared statement cache on top of asyncpg's,
+    # both have to be disabled (size 0) behind pgbouncer in transaction mode.
+    url = make_url(url).update_query_dict(
+        {'prepared_statement_cache_size': str(config.DB_STATEMENT_CACHE_SIZE)}
+    )
+    engine = create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_logging_name=name,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+        connect_args={'statement_cache_size': config.DB_STATEMENT_CACHE_SIZE},
+    )
+    instrument_engine(engine)
+    return engine
+
+
+engine = create_engine(config.DB_URL, 'primary')
+replica_engine = engine
+if config.DB_REPLICA_URL:
+    replica_engine = create_engine(config.DB_REPLICA_URL, 'replica')
 
-engine = create_async_engine(config.DB_URL)
 session_factory = async_sessionmaker(engine, expire_on_commit=False)
+read_session_factory = async_sessionmaker(replica_engine, expire_on_commit=False)
+
+primary_until = 0.0
+
+
+def pin_primary(seconds: float) -> None:
+    global primary_until
+    primary_until = max(primary_until, time() + seconds)
+
+
+def get_read_session_factory() -> async_sessionmaker:
+    # Whatever is read right after an invalidation stays cached until the
+    # next one, so it must not come from a replica that is still lagging.
+    if time() < primary_until:
+        return session_factory
+    return read_session_factory
 
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async with session_factory() as session:
-        yield session
+async def dispose_engines() -> None:
+    await engine.dispose()
+    if replica_engine is not engine:
+        await replica_engine.dispose()
@@ -1,17 +1,116 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
+from datetime import date
 
 from fastapi import FastAPI
+from redis.exceptions import RedisError
 
+from app.api.metrics import metrics_router
 from app.api.root import root_router
+from app.api.trading import warm_trading_cache
 from app.core.config import config
-from app.core.redis import redis_client
-from app.utils.scheduler import scheduler_cache_clear
+from app.core.database import dispose_engines, pin_primary, session_factory
+from app.services.trading import TradingService
+from app.utils.cache import (
+    bump_generation,
+    flush_cache_stats,
+    invalidate_date,
+    last_invalidated_day,
+    listen_invalidations,
+    load_generation,
+    remember_day,
+)
+from app.utils.events import listen_trading_days
+from app.utils.metrics import LatencyMiddleware
+from app.utils.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up() -> None:
+    if not config.WARMUP_ENABLED:
+        return
+    try:
+        warmed = await asyncio.wait_for(warm_trading_cache(), config.WARMUP_TIMEOUT)
+        logger.info('Cache warm-up finished: %s queries', warmed)
+    except (asyncio.TimeoutError, OSError, RedisError) as e:
+        logger.warning('Cache warm-up interrupted: %s', e)
+
+
+warm_up_lock = asyncio.Lock()
+warm_up_pending = False
+
+
+async def coalesced_warm_up() -> None:
+    # A backfill announces hundreds of days in a row; notifications that
+    # arrive while a warm-up runs are folded into a single rerun.
+    global warm_up_pending
+    warm_up_pending = True
+    if warm_up_lock.locked():
+        return
+    async with warm_up_lock:
+        while warm_up_pending:
+            warm_up_pending = False
+            await warm_up()
+
+
+async def on_day_loaded(date_: date) -> None:
+    pin_primary(config.DB_REPLICA_MAX_LAG)
+    await invalidate_date(date_)
+    await coalesced_warm_up()
+
+
+async def get_last_date() -> date | None:
+    service = TradingService(session_factory=session_factory)
+    try:
+        return await service.get_last_date()
+    finally:
+        await service.close()
+
+
+async def on_listener_connect(reconnected: bool) -> None:
+    # Days loaded while the listener was away were never announced, so
+    # nothing cached before the disconnect can be trusted. On startup the
+    # cache is only dropped if a day was loaded while no worker listened,
+    # otherwise every starting worker would throw away the warm-up.
+    last_date = await get_last_date()
+    if not reconnected:
+        last_day = await last_invalidated_day()
+        if last_date is None or (last_day is not None and last_date <= last_day):
+            return
+
+    pin_primary(config.DB_REPLICA_MAX_LAG)
+    await bump_generation()
+    if last_date is not None:
+        await remember_day(last_date)
+    await coalesced_warm_up()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    scheduler_cache_clear(redis_client)
+    scheduler.add_job(
+        flush_cache_stats,
+        'interval',
+        seconds=10,
+        id='flush_cache_stats',
+        replace_existing=True,
+    )
+    scheduler.start()
+    try:
+        await load_generation()
+    except (OSError, RedisError) as e:
+        logger.warning('Cache generation is not loaded: %s', e)
+    await warm_up()
+    listeners = [
+        asyncio.create_task(listen_trading_days(on_day_loaded, on_listener_connect)),
+        asyncio.create_task(listen_invalidations()),
+    ]
     yield
+    for listener in listeners:
+        listener.cancel()
+    scheduler.shutdown(wait=False)
+    await dispose_engines()
 
 
 app = FastAPI(
@@ -22,3 +121,6 @@ app = FastAPI(
 )
 
 app.include_router(root_router)
+app.include_router(metrics_router)
+
+app.add_middleware(LatencyMiddleware)
@@ -1,10 +1,18 @@
 from datetime import date
+from enum import Enum
 
 from .base import BaseSchema
 
 
+class DayStatsSchema(BaseSchema):
+    rows_count: int
+    volume: int
+    total: int
+
+
 class DateSchema(BaseSchema):
     date: date
+    stats: DayStatsSchema | None = None
 
 
 class TradingSchema(BaseSchema):
@@ -18,3 +26,36 @@ class TradingSchema(BaseSchema):
     total: int
     count: int
     date: date
+
+
+class TradingPageSchema(BaseSchema):
+    items: list[TradingSchema]
+    next_cursor: str | None = None
+
+
+class Period(str, Enum):
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+
+
+class GroupBy(str, Enum):
+    OIL_ID = 'oil_id'
+    DELIVERY_BASIS_ID = 'delivery_basis_id'
+    DELIVERY_TYPE_ID = 'delivery_type_id'
+
+
+class DynamicsSchema(BaseSchema):
+    period: date
+    group: str
+    volume: int
+    total: int
+    count: int
+    average_price: float | None
+
+
+class ExportFormat(str, Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+    ARROW = 'arrow'
+    PARQUET = 'parquet'
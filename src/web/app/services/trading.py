@@ -1,59 +1,166 @@
+from contextlib import asynccontextmanager
 from datetime import date
-from typing import Annotated
+from typing import AsyncGenerator
 
-from fastapi import Depends
-from sqlalchemy import desc, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
+from sqlalchemy import Date, Row, Select, cast, desc, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.core.database import get_session
-from app.models.trading import TradingResult
-from app.schemas.trading import DateSchema, TradingSchema
+from app.core.database import get_read_session_factory
+from app.models.trading import TradingDay, TradingResult, TradingRollup
+from app.schemas.trading import (
+    DateSchema,
+    DayStatsSchema,
+    DynamicsSchema,
+    GroupBy,
+    Period,
+    TradingPageSchema,
+    TradingSchema,
+)
 from app.utils.cache import async_cache
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+TRADING_COLUMNS = (
+    TradingResult.exchange_product_id,
+    TradingResult.exchange_product_name,
+    TradingResult.oil_id,
+    TradingResult.delivery_basis_id,
+    TradingResult.delivery_basis_name,
+    TradingResult.delivery_type_id,
+    TradingResult.volume,
+    TradingResult.total,
+    TradingResult.count,
+    TradingResult.date,
+)
+PAGE_COLUMNS = (*TRADING_COLUMNS, TradingResult.id)
+
+trades_adapter = TypeAdapter(list[TradingSchema])
 
 
 class TradingService:
-    def __init__(self, session: AsyncSession):
-        self.session = session
+    def __init__(
+        self,
+        session: AsyncSession | None = None,
+        session_factory: async_sessionmaker | None = None,
+    ):
+        self._session = session
+        self._session_factory = session_factory
+        self._owns_session = False
 
-    @async_cache()
-    async def get_dates(self, limit: int, offset: int) -> list[DateSchema]:
-        stmt = (
-            select(TradingResult.date)
-            .distinct()
-            .order_by(desc(TradingResult.date))
-            .limit(limit)
-            .offset(offset)
-        )
+    @property
+    def session(self) -> AsyncSession:
+        # Opened on first query, so requests answered from the cache
+        # never check a connection out of the pool.
+        if self._session is None:
+            self._session = self._get_session_factory()()
+            self._owns_session = True
+        return self._session
 
-        result = await self.session.scalars(stmt)
-        dates = result.all()
+    def _get_session_factory(self) -> async_sessionmaker:
+        return self._session_factory or get_read_session_factory()
 
-        return [DateSchema(date=date_) for date_ in dates]
+    async def close(self) -> None:
+        if self._owns_session:
+            await self._session.close()
+            self._session = None
+            self._owns_session = False
 
-    @async_cache()
-    async def get_last_trades(
-        self,
-        limit: int,
-        offset: int,
+    @asynccontextmanager
+    async def detached(self) -> AsyncGenerator['TradingService', None]:
+        async with self._get_session_factory()() as session:
+            yield TradingService(session, self._session_factory)
+
+    @staticmethod
+    def _trades_stmt(
         oil_id: str | None,
         delivery_type_id: str | None,
         delivery_basis_id: str | None,
-    ) -> list[TradingSchema]:
-        stmt = select(TradingResult)
+        start_date: date | None = None,
+        end_date: date | None = None,
+        columns: tuple = PAGE_COLUMNS,
+    ) -> Select:
+        stmt = select(*columns)
         if oil_id:
             stmt = stmt.where(TradingResult.oil_id == oil_id)
         if delivery_type_id:
             stmt = stmt.where(TradingResult.delivery_type_id == delivery_type_id)
         if delivery_basis_id:
             stmt = stmt.where(TradingResult.delivery_basis_id == delivery_basis_id)
-        stmt = stmt.order_by(desc(TradingResult.date)).limit(limit).offset(offset)
+        if start_date:
+            stmt = stmt.where(TradingResult.date >= start_date)
+        if end_date:
+            stmt = stmt.where(TradingResult.date <= end_date)
+        return stmt.order_by(desc(TradingResult.date), desc(TradingResult.id))
+
+    async def _get_page(
+        self, stmt: Select, limit: int, offset: int, cursor: str | None
+    ) -> TradingPageSchema:
+        if cursor:
+            cursor_date, cursor_id = decode_cursor(cursor)
+            stmt = stmt.where(
+                tuple_(TradingResult.date, TradingResult.id) < tuple_(cursor_date, cursor_id)
+            )
+        stmt = stmt.limit(limit).offset(offset)
+
+        result = await self.session.execute(stmt)
+        rows = result.all()
+
+        next_cursor = None
+        if rows and len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
+
+        return TradingPageSchema(
+            items=trades_adapter.validate_python(rows, from_attributes=True),
+            next_cursor=next_cursor,
+        )
+
+    async def get_last_date(self) -> date | None:
+        return await self.session.scalar(select(func.max(TradingDay.date)))
+
+    @async_cache()
+    async def get_dates(
+        self, limit: int, offset: int, with_stats: bool = False
+    ) -> list[DateSchema]:
+        stmt = select(TradingDay).order_by(desc(TradingDay.date)).limit(limit).offset(offset)
 
         result = await self.session.scalars(stmt)
-        trades = result.all()
+        days = result.all()
 
-        return [TradingSchema.model_validate(trading) for trading in trades]
+        return [
+            DateSchema(
+                date=day.date,
+                stats=DayStatsSchema.model_validate(day) if with_stats else None,
+            )
+            for day in days
+        ]
+
+    async def get_last_trades(
+        self,
+        limit: int,
+        offset: int,
+        oil_id: str | None,
+        delivery_type_id: str | None,
+        delivery_basis_id: str | None,
+    ) -> list[TradingSchema]:
+        page = await self.get_last_trades_page(
+            limit, offset, None, oil_id, delivery_type_id, delivery_basis_id
+        )
+        return page.items
 
     @async_cache()
+    async def get_last_trades_page(
+        self,
+        limit: int,
+        offset: int,
+        cursor: str | None,
+        oil_id: str | None,
+        delivery_type_id: str | None,
+        delivery_basis_id: str | None,
+    ) -> TradingPageSchema:
+        stmt = self._trades_stmt(oil_id, delivery_type_id, delivery_basis_id)
+        return await self._get_page(stmt, limit, offset, cursor)
+
     async def get_range_trades(
         self,
         limit: int,
@@ -64,26 +171,111 @@ class TradingService:
         start_date: date | None,
         end_date: date | None,
     ) -> list[TradingSchema]:
-        stmt = select(TradingResult)
-        if oil_id:
-            stmt = stmt.where(TradingResult.oil_id == oil_id)
-        if delivery_type_id:
-            stmt = stmt.where(TradingResult.delivery_type_id == delivery_type_id)
-        if delivery_basis_id:
-            stmt = stmt.where(TradingResult.delivery_basis_id == delivery_basis_id)
+        page = await self.get_range_trades_page(
+            limit,
+            offset,
+            None,
+            oil_id,
+            delivery_type_id,
+            delivery_basis_id,
+            start_date,
+            end_date,
+        )
+        return page.items
+
+    @async_cache(covers=lambda arguments: (arguments['start_date'], arguments['end_date']))
+    async def get_range_trades_page(
+        self,
+        limit: int,
+        offset: int,
+        cursor: str | None,
+        oil_id: str | None,
+        delivery_type_id: str | None,
+        delivery_basis_id: str | None,
+        start_date: date | None,
+        end_date: date | None,
+    ) -> TradingPageSchema:
+        stmt = self._trades_stmt(oil_id, delivery_type_id, delivery_basis_id, start_date, end_date)
+        return await self._get_page(stmt, limit, offset, cursor)
+
+    @async_cache(covers=lambda arguments: (arguments['start_date'], arguments['end_date']))
+    async def get_dynamics(
+        self,
+        group_by: GroupBy,
+        period: Period,
+        start_date: date | None,
+        end_date: date | None,
+        group: str | None = None,
+    ) -> list[DynamicsSchema]:
+        if period == Period.DAY:
+            period_start = TradingRollup.date
+        else:
+            period_start = cast(func.date_trunc(period.value, TradingRollup.date), Date)
+        period_start = period_start.label('period')
+
+        volume = func.sum(TradingRollup.volume).label('volume')
+        total = func.sum(TradingRollup.total).label('total')
+
+        stmt = select(
+            period_start,
+            TradingRollup.value.label('group'),
+            volume,
+            total,
+            func.sum(TradingRollup.count).label('count'),
+        ).where(TradingRollup.dimension == group_by.value)
+        if group:
+            stmt = stmt.where(TradingRollup.value == group)
         if start_date:
-            stmt = stmt.where(TradingResult.date >= start_date)
+            stmt = stmt.where(TradingRollup.date >= start_date)
         if end_date:
-            stmt = stmt.where(TradingResult.date <= end_date)
-        stmt = stmt.order_by(desc(TradingResult.date)).limit(limit).offset(offset)
+            stmt = stmt.where(TradingRollup.date <= end_date)
+        stmt = stmt.group_by(period_start, TradingRollup.value).order_by(
+            period_start, TradingRollup.value
+        )
 
-        result = await self.session.scalars(stmt)
-        trades = result.all()
+        result = await self.session.execute(stmt)
+
+        return [
+            DynamicsSchema(
+                period=row.period,
+                group=row.group,
+                volume=row.volume,
+                total=row.total,
+                count=row.count,
+                average_price=row.total / row.volume if row.volume else None,
+            )
+            for row in result.all()
+        ]
+
+    async def stream_trades(
+        self,
+        oil_id: str | None,
+        delivery_type_id: str | None,
+        delivery_basis_id: str | None,
+        start_date: date | None,
+        end_date: date | None,
+        chunk_size: int = 5000,
+    ) -> AsyncGenerator[list[Row], None]:
+        stmt = self._trades_stmt(
+            oil_id,
+            delivery_type_id,
+            delivery_basis_id,
+            start_date,
+            end_date,
+            columns=TRADING_COLUMNS,
+        ).execution_options(yield_per=chunk_size)
 
-        return [TradingSchema.model_validate(trading) for trading in trades]
+        # The response is streamed after the request dependencies are closed,
+        # so the server-side cursor needs a session of its own.
+        async with self.detached() as service:
+            result = await service.session.stream(stmt)
+            async for partition in result.partitions():
+                yield partition
 
 
-def get_trading_service(
-    session: Annotated[AsyncSession, Depends(get_session)],
-) -> TradingService:
-    return TradingService(session)
+async def get_trading_service() -> AsyncGenerator[TradingService, None]:
+    service = TradingService()
+    try:
+        yield service
+    finally:
+        await service.close()
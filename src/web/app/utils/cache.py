@@ -1,30 +1,522 @@
+import asyncio
+import gzip
 import hashlib
-import pickle
-from functools import wraps
-from typing import Awaitable, Callable
+import inspect
+import json
+import logging
+import math
+import random
+from collections import Counter
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache, wraps
+from time import perf_counter, time
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
 
+import zstandard
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+from redis.exceptions import RedisError
+
+from app.core.config import config
 from app.core.redis import redis_client
+from app.utils import codec
+from app.utils.local_cache import LocalCache
+from app.utils.metrics import CACHE_LATENCY, CACHE_REQUESTS
+
+LATEST_TAG_KEY = 'cache:latest'
+RANGES_KEY = 'cache:ranges'
+RANGE_STARTS_KEY = 'cache:range-starts'
+RANGE_EXPIRY_KEY = 'cache:range-expiry'
+GENERATION_KEY = 'cache:generation'
+LAST_DAY_KEY = 'cache:last-day'
+
+INVALIDATION_CHANNEL = 'cache:invalidate'
+STATS_KEY_PREFIX = 'cache:stats'
+POPULAR_KEY_PREFIX = 'cache:popular'
+POPULAR_MAX_SIZE = 1000
+
+LOCK_TIMEOUT = 30
+LOCK_POLL_INTERVAL = 0.05
+RECONNECT_DELAY = 5
+
+DateRange = tuple[date | None, date | None]
+
+_inflight: dict[str, asyncio.Future] = {}
+_background_tasks: set[asyncio.Future] = set()
+
+cache_stats: dict[str, Counter] = {}
+query_stats: dict[str, Counter] = {}
+
+# Every key embeds the generation, so bumping it drops all entries at once
+# without scanning Redis; the old ones simply expire.
+generation = 0
+
+local_cache = LocalCache(max_size=config.CACHE_L1_SIZE, ttl=config.CACHE_L1_TTL)
+worker_id = uuid4().hex
+
+logger = logging.getLogger(__name__)
+
+
+async def _publish_invalidation(keys: list[str]) -> None:
+    if local_cache.enabled and keys:
+        message = json.dumps({'sender': worker_id, 'keys': keys})
+        await redis_client.publish(INVALIDATION_CHANNEL, message)
+
+
+def _set_generation(value: int) -> None:
+    global generation
+    if value != generation:
+        generation = value
+        local_cache.clear()
+
+
+async def load_generation() -> int:
+    _set_generation(int(await redis_client.get(GENERATION_KEY) or 0))
+    return generation
+
+
+async def bump_generation() -> int:
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.incr(GENERATION_KEY)
+        pipe.delete(LATEST_TAG_KEY, RANGES_KEY, RANGE_STARTS_KEY, RANGE_EXPIRY_KEY)
+        value, _ = await pipe.execute()
+    if value <= generation:
+        # The counter was evicted or flushed, reusing an old generation
+        # would bring back the entries it was bumped away from.
+        value = generation + 1
+        await redis_client.set(GENERATION_KEY, value)
+
+    _set_generation(value)
+    message = json.dumps({'sender': worker_id, 'generation': value})
+    await redis_client.publish(INVALIDATION_CHANNEL, message)
+    return value
+
+
+async def listen_invalidations() -> None:
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                local_cache.clear()
+                await load_generation()
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    data = json.loads(message['data'])
+                    if data['sender'] == worker_id:
+                        continue
+                    if 'generation' in data:
+                        _set_generation(data['generation'])
+                    else:
+                        local_cache.delete(*data['keys'])
+        except (OSError, RedisError) as e:
+            logger.warning('Cache invalidation listener error: %s', e)
+
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def _latest_keys() -> list[str]:
+    keys = await redis_client.zrangebyscore(LATEST_TAG_KEY, time(), '+inf')
+    return [key.decode() for key in keys]
+
+
+async def _prune_ranges(now: float) -> None:
+    expired = await redis_client.zrangebyscore(RANGE_EXPIRY_KEY, '-inf', now)
+    if expired:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zrem(RANGES_KEY, *expired)
+            pipe.hdel(RANGE_STARTS_KEY, *expired)
+            pipe.zrem(RANGE_EXPIRY_KEY, *expired)
+            await pipe.execute()
+
+
+async def _register_key(key: str, date_range: DateRange | None, expire: int) -> None:
+    # Members are scored by the expiry of their entry, so the ones that
+    # expired by TTL are pruned here instead of piling up.
+    now = time()
+    if date_range is None:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(LATEST_TAG_KEY, '-inf', now)
+            pipe.zadd(LATEST_TAG_KEY, {key: now + expire})
+            await pipe.execute()
+        return
+
+    start_date, end_date = date_range
+    end_score = end_date.toordinal() if end_date else '+inf'
+    start_score = start_date.toordinal() if start_date else 0
+
+    await _prune_ranges(now)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zadd(RANGES_KEY, {key: end_score})
+        pipe.hset(RANGE_STARTS_KEY, key, start_score)
+        pipe.zadd(RANGE_EXPIRY_KEY, {key: now + expire})
+        await pipe.execute()
+
+
+async def invalidate_latest() -> list[str]:
+    keys = await _latest_keys()
+    if keys:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(*keys)
+            pipe.zrem(LATEST_TAG_KEY, *keys)
+            await pipe.execute()
+        local_cache.delete(*keys)
+        await _publish_invalidation(keys)
+    return keys
+
+
+async def last_invalidated_day() -> date | None:
+    ordinal = await redis_client.get(LAST_DAY_KEY)
+    return date.fromordinal(int(ordinal)) if ordinal else None
+
+
+async def remember_day(date_: date) -> None:
+    last_day = await last_invalidated_day()
+    if last_day is None or last_day < date_:
+        await redis_client.set(LAST_DAY_KEY, date_.toordinal())
+
+
+async def invalidate_date(date_: date) -> list[str]:
+    ordinal = date_.toordinal()
+    await remember_day(date_)
+
+    latest_keys = await _latest_keys()
+
+    candidates = [
+        key.decode() for key in await redis_client.zrangebyscore(RANGES_KEY, ordinal, '+inf')
+    ]
+    starts = await redis_client.hmget(RANGE_STARTS_KEY, candidates) if candidates else []
+    range_keys = [
+        key for key, start in zip(candidates, starts) if start is None or int(start) <= ordinal
+    ]
+
+    keys = latest_keys + range_keys
+    if not keys:
+        return []
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.delete(*keys)
+        if latest_keys:
+            pipe.zrem(LATEST_TAG_KEY, *latest_keys)
+        if range_keys:
+            pipe.zrem(RANGES_KEY, *range_keys)
+            pipe.hdel(RANGE_STARTS_KEY, *range_keys)
+            pipe.zrem(RANGE_EXPIRY_KEY, *range_keys)
+        await pipe.execute()
+
+    local_cache.delete(*keys)
+    await _publish_invalidation(keys)
+    return keys
+
+
+def _encode_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return _encode_value(value.value)
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'date': value.isoformat()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_encode_value(item) for item in value), key=repr)
+    if isinstance(value, dict):
+        return {str(key): _encode_value(item) for key, item in value.items()}
+    raise TypeError(f'Cannot build a cache key from {type(value).__name__}')
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    if isinstance(value, dict):
+        if value.keys() == {'datetime'}:
+            return datetime.fromisoformat(value['datetime'])
+        if value.keys() == {'date'}:
+            return date.fromisoformat(value['date'])
+        return {key: _decode_value(item) for key, item in value.items()}
+    return value
+
+
+def canonical_arguments(signature: inspect.Signature, args: tuple, kwargs: dict) -> str:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+
+    arguments = dict(bound.arguments)
+    arguments.pop('self', None)
+
+    encoded = {name: _encode_value(value) for name, value in arguments.items()}
+    return json.dumps(encoded, sort_keys=True, separators=(',', ':'))
+
+
+def _record(namespace: str, outcome: str, started: float) -> None:
+    cache_stats.setdefault(namespace, Counter())[outcome] += 1
+    CACHE_REQUESTS.labels(namespace, outcome).inc()
+    CACHE_LATENCY.labels(namespace, outcome).observe(perf_counter() - started)
 
 
-def async_cache(ttl: int = 60 * 60 * 24):
+async def flush_cache_stats() -> None:
+    if not cache_stats and not query_stats:
+        return
+
+    stats = {namespace: counter.copy() for namespace, counter in cache_stats.items()}
+    queries = {namespace: counter.copy() for namespace, counter in query_stats.items()}
+    cache_stats.clear()
+    query_stats.clear()
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for namespace, counter in stats.items():
+            for outcome, count in counter.items():
+                pipe.hincrby(f'{STATS_KEY_PREFIX}:{namespace}', outcome, count)
+        for namespace, counter in queries.items():
+            key = f'{POPULAR_KEY_PREFIX}:{namespace}'
+            for arguments, count in counter.items():
+                pipe.zincrby(key, count, arguments)
+            pipe.zremrangebyrank(key, 0, -POPULAR_MAX_SIZE - 1)
+        await pipe.execute()
+
+
+@lru_cache
+def _argument_adapter(annotation: Any) -> TypeAdapter:
+    return TypeAdapter(annotation)
+
+
+def restore_arguments(signature: inspect.Signature, arguments: dict[str, Any]) -> dict[str, Any]:
+    restored = {}
+    for name, value in arguments.items():
+        annotation = signature.parameters[name].annotation
+        if annotation is not inspect.Parameter.empty:
+            value = _argument_adapter(annotation).validate_python(value)
+        restored[name] = value
+    return restored
+
+
+async def popular_arguments(func: Callable, top: int) -> list[dict[str, Any]]:
+    members = await redis_client.zrevrange(f'{POPULAR_KEY_PREFIX}:{func.namespace}', 0, top - 1)
+
+    popular = []
+    for member in members:
+        try:
+            popular.append(restore_arguments(func.signature, _decode_value(json.loads(member))))
+        except (KeyError, ValueError) as e:
+            logger.warning('Skipped popular arguments of %s: %s', func.namespace, e)
+    return popular
+
+
+def _dumps(value: Any) -> bytes:
+    return codec.encode(value, config.CACHE_COMPRESS_MIN_SIZE)
+
+
+def _loads(cached: bytes | None) -> Any:
+    if not cached:
+        return None
+    try:
+        return codec.decode(cached)
+    except (ValueError, KeyError, zstandard.ZstdError):
+        # Left over from an older payload format or a renamed schema,
+        # recomputed as a miss.
+        return None
+
+
+async def _wait_for_value(key: str, timeout: float) -> bytes | None:
+    deadline = time() + timeout
+    while time() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        cached = await redis_client.get(key)
+        if cached:
+            return cached
+    return None
+
+
+def _spawn(coro: Awaitable) -> None:
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def async_cache(
+    ttl: int = 60 * 60 * 24,
+    covers: Callable[[dict[str, Any]], DateRange] | None = None,
+    stale_ttl: int = 60 * 5,
+    jitter: float = 0.1,
+    version: int = 1,
+    closed_ttl: int = 60 * 60 * 24 * 7,
+):
     def decorator(func: Callable[..., Awaitable]):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            key_data = {
-                'args': args[1:],
-                'kwargs': kwargs,
-            }
-            key_str = f'{func.__name__}:{key_data}'
-            key_hash = hashlib.md5(key_str.encode()).hexdigest()
+        signature = inspect.signature(func)
+        namespace = f'{func.__qualname__}:v{version}'
+
+        def digest_key(arguments: str) -> str:
+            digest = hashlib.blake2b(arguments.encode(), digest_size=16).hexdigest()
+            return f'{namespace}:g{generation}:{digest}'
+
+        def build_key(args: tuple, kwargs: dict) -> str:
+            return digest_key(canonical_arguments(signature, args, kwargs))
+
+        def get_date_range(args: tuple, kwargs: dict) -> DateRange | None:
+            if covers is None:
+                return None
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return covers(bound.arguments)
+
+        def get_expiry(date_range: DateRange | None) -> tuple[float | None, int | None]:
+            # Closed ranges only change when a day inside them is loaded,
+            # which invalidates them explicitly, so they never go stale. They
+            # still expire in case a notification was lost.
+            if date_range and date_range[1]:
+                return None, closed_ttl
+            fresh_for = ttl * random.uniform(1 - jitter, 1 + jitter)
+            return time() + fresh_for, math.ceil(fresh_for + stale_ttl)
+
+        async def compute(key: str, produce: Callable, args: tuple, kwargs: dict) -> Any:
+            lock = redis_client.lock(f'lock:{key}', timeout=LOCK_TIMEOUT)
+            if not await lock.acquire(blocking=False):
+                entry = _loads(await _wait_for_value(key, LOCK_TIMEOUT))
+                if entry is not None:
+                    local_cache.set(key, entry)
+                    return entry[1]
 
-            cached = await redis_client.get(key_hash)
-            if cached:
-                return pickle.loads(cached)
+            try:
+                result = await produce(*args, **kwargs)
 
-            result = await func(*args, **kwargs)
-            await redis_client.set(key_hash, pickle.dumps(result), ex=ttl)
-            return result
+                date_range = get_date_range(args, kwargs)
+                fresh_until, expire = get_expiry(date_range)
 
+                await redis_client.set(key, _dumps((fresh_until, result)), ex=expire)
+                await _register_key(key, date_range, expire)
+                local_cache.set(key, (fresh_until, result))
+                await _publish_invalidation([key])
+                return result
+            finally:
+                if await lock.owned():
+                    await lock.release()
+
+        def single_flight(key: str, produce: Callable, args: tuple, kwargs: dict) -> asyncio.Future:
+            task = _inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(compute(key, produce, args, kwargs))
+                _inflight[key] = task
+                task.add_done_callback(lambda _: _inflight.pop(key, None))
+            return task
+
+        async def refresh(key: str, produce: Callable, args: tuple, kwargs: dict) -> None:
+            instance = args[0] if args else None
+            if not hasattr(instance, 'detached'):
+                await single_flight(key, produce, args, kwargs)
+                return
+
+            async with instance.detached() as detached:
+                await single_flight(key, produce, (detached, *args[1:]), kwargs)
+
+        async def cached_call(
+            key: str,
+            namespace: str,
+            produce: Callable[..., Awaitable],
+            args: tuple,
+            kwargs: dict,
+            track: bool = True,
+        ) -> Any:
+            started = perf_counter()
+
+            entry = local_cache.get(key)
+            if entry is None:
+                entry = _loads(await redis_client.get(key))
+                if entry is not None:
+                    local_cache.set(key, entry)
+
+            if entry is not None:
+                fresh_until, result = entry
+                if fresh_until is not None and fresh_until < time() and key not in _inflight:
+                    _spawn(refresh(key, produce, args, kwargs))
+                if track:
+                    _record(namespace, 'hits', started)
+                return result
+
+            try:
+                return await asyncio.shield(single_flight(key, produce, args, kwargs))
+            finally:
+                if track:
+                    _record(namespace, 'misses', started)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = f'cache:{build_key(args, kwargs)}'
+            return await cached_call(key, namespace, func, args, kwargs)
+
+        wrapper.namespace = namespace
+        wrapper.signature = signature
+        wrapper.digest_key = digest_key
+        wrapper.build_key = build_key
+        wrapper.get_date_range = get_date_range
+        wrapper.get_expiry = get_expiry
+        wrapper.cached_call = cached_call
         return wrapper
 
     return decorator
+
+
+def _accepts(header: str, value: str) -> bool:
+    return any(item.split(';')[0].strip() in (value, '*') for item in header.split(','))
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, so the same ETag matches both the gzip and the
+    # identity encoded variant of a response.
+    etags = {item.strip().removeprefix('W/') for item in header.split(',')}
+    return '*' in etags or etag.removeprefix('W/') in etags
+
+
+async def response_entry(
+    method: Callable[..., Awaitable],
+    serialize: Callable[[Any], tuple[bytes, dict[str, str]]],
+    track: bool = True,
+    **kwargs,
+) -> tuple[bytes, str | None, dict[str, str]]:
+    func, instance = method.__func__, method.__self__
+    arguments = canonical_arguments(func.signature, (instance,), kwargs)
+    key = f'cache:response:{func.digest_key(arguments)}'
+
+    # Warm-up requests are not counted, otherwise they would keep
+    # themselves at the top of the popularity ranking.
+    if track:
+        query_stats.setdefault(func.namespace, Counter())[arguments] += 1
+
+    async def render(*args, **kwargs) -> tuple[bytes, str | None, dict[str, str]]:
+        # Only the rendered response is cached, the result object is not.
+        body, headers = serialize(await func.__wrapped__(*args, **kwargs))
+        headers['ETag'] = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+        encoding = None
+        if len(body) >= config.CACHE_COMPRESS_MIN_SIZE:
+            body, encoding = gzip.compress(body, compresslevel=5), 'gzip'
+        return body, encoding, headers
+
+    return await func.cached_call(
+        key, f'response:{func.namespace}', render, (instance,), kwargs, track
+    )
+
+
+async def cached_response(
+    request: Request,
+    method: Callable[..., Awaitable],
+    serialize: Callable[[Any], tuple[bytes, dict[str, str]]],
+    **kwargs,
+) -> Response:
+    body, encoding, headers = await response_entry(method, serialize, **kwargs)
+    headers = headers | {'Vary': 'Accept-Encoding'}
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and _etag_matches(if_none_match, headers['ETag']):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if encoding is not None:
+        if _accepts(request.headers.get('Accept-Encoding', ''), encoding):
+            headers['Content-Encoding'] = encoding
+        else:
+            body = gzip.decompress(body)
+
+    return Response(content=body, media_type='application/json', headers=headers)
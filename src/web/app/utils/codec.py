@@ -0,0 +1,151 @@
+from datetime import date, datetime
+from enum import Enum
+from functools import cache
+from typing import Any
+
+import msgpack
+import zstandard
+from pydantic import BaseModel, TypeAdapter
+
+from app.schemas.base import BaseSchema
+
+RAW = b'\x01'
+ZSTD = b'\x02'
+
+DATE_EXT = 1
+DATETIME_EXT = 2
+
+# Containers are tagged lists, so nothing read back depends on guessing
+# the meaning of a plain dict.
+LIST = 'L'
+TUPLE = 'T'
+DICT = 'D'
+MODEL = 'M'
+MODEL_COLUMNS = 'C'
+DICTIONARY = 'S'
+VALUES = 'V'
+
+SCALARS = {type(None), bool, int, float, str, bytes, date, datetime}
+
+_compressor = zstandard.ZstdCompressor(level=3)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+@cache
+def _list_adapter(schema: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[schema])
+
+
+@cache
+def _schemas() -> dict[str, type[BaseModel]]:
+    schemas = {}
+    pending = [BaseSchema]
+    while pending:
+        schema = pending.pop()
+        schemas[schema.__name__] = schema
+        pending += schema.__subclasses__()
+    return schemas
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return msgpack.ExtType(DATETIME_EXT, value.isoformat().encode())
+    if isinstance(value, date):
+        return msgpack.ExtType(DATE_EXT, value.toordinal().to_bytes(4, 'big'))
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f'Cannot encode {type(value).__name__}')
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == DATE_EXT:
+        return date.fromordinal(int.from_bytes(data, 'big'))
+    if code == DATETIME_EXT:
+        return datetime.fromisoformat(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def _encode_column(values: list) -> list:
+    types = {type(value) for value in values}
+    if types == {str}:
+        # Product and basis names repeat on almost every row of a page, so
+        # string columns with few distinct values are stored as indices.
+        distinct = list(dict.fromkeys(values))
+        if len(distinct) * 2 <= len(values):
+            positions = {value: i for i, value in enumerate(distinct)}
+            return [DICTIONARY, distinct, [positions[value] for value in values]]
+    if types <= SCALARS:
+        return [VALUES, values]
+    return _pack(values)
+
+
+def _decode_column(column: list) -> list:
+    if column[0] == DICTIONARY:
+        distinct = column[1]
+        return [distinct[i] for i in column[2]]
+    if column[0] == VALUES:
+        return column[1]
+    return _unpack(column)
+
+
+def _pack(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        names = list(type(value).model_fields)
+        values = [_pack(getattr(value, name)) for name in names]
+        return [MODEL, type(value).__name__, names, values]
+    if isinstance(value, list):
+        if (
+            value
+            and isinstance(value[0], BaseModel)
+            and all(type(item) is type(value[0]) for item in value)
+        ):
+            names = list(type(value[0]).model_fields)
+            columns = [_encode_column([getattr(item, name) for item in value]) for name in names]
+            return [MODEL_COLUMNS, type(value[0]).__name__, names, columns]
+        return [LIST, [_pack(item) for item in value]]
+    if isinstance(value, tuple):
+        return [TUPLE, [_pack(item) for item in value]]
+    if isinstance(value, dict):
+        return [DICT, {key: _pack(item) for key, item in value.items()}]
+    return value
+
+
+def _unpack(value: Any) -> Any:
+    if not isinstance(value, list):
+        return value
+
+    tag = value[0]
+    if tag == LIST:
+        return [_unpack(item) for item in value[1]]
+    if tag == TUPLE:
+        return tuple(_unpack(item) for item in value[1])
+    if tag == DICT:
+        return {key: _unpack(item) for key, item in value[1].items()}
+    if tag == MODEL:
+        schema = _schemas()[value[1]]
+        return schema.model_construct(**dict(zip(value[2], map(_unpack, value[3]))))
+    if tag == MODEL_COLUMNS:
+        schema = _schemas()[value[1]]
+        names = value[2]
+        columns = [_decode_column(column) for column in value[3]]
+        rows = [dict(zip(names, row)) for row in zip(*columns)]
+        return _list_adapter(schema).validate_python(rows)
+    raise ValueError(f'Unknown cache payload tag: {tag}')
+
+
+def encode(value: Any, compress_min_size: int = 1024) -> bytes:
+    packed = msgpack.packb(_pack(value), default=_default, use_bin_type=True)
+    if len(packed) >= compress_min_size:
+        compressed = _compressor.compress(packed)
+        if len(compressed) < len(packed):
+            return ZSTD + compressed
+    return RAW + packed
+
+
+def decode(data: bytes) -> Any:
+    header, payload = data[:1], data[1:]
+    if header == ZSTD:
+        payload = _decompressor.decompress(payload)
+    elif header != RAW:
+        raise ValueError('Unknown cache payload format')
+    return _unpack(msgpack.unpackb(payload, ext_hook=_ext_hook, raw=False))
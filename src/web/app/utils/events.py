@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from datetime import date
+from typing import Awaitable, Callable
+
+import asyncpg
+
+from app.core.config import config
+
+TRADING_DAY_CHANNEL = 'trading_day_loaded'
+RECONNECT_DELAY = 5
+
+logger = logging.getLogger(__name__)
+
+
+async def listen_trading_days(
+    on_day_loaded: Callable[[date], Awaitable[None]],
+    on_connect: Callable[[bool], Awaitable[None]] | None = None,
+) -> None:
+    tasks = set()
+    reconnected = False
+
+    def on_notification(connection, pid, channel, payload):
+        task = asyncio.create_task(on_day_loaded(date.fromisoformat(payload)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(config.LISTEN_DB_URL)
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(TRADING_DAY_CHANNEL, on_notification)
+
+            if on_connect is not None:
+                await on_connect(reconnected)
+            reconnected = True
+            await closed.wait()
+        except Exception:
+            logger.exception('Trading day listener error')
+            reconnected = True
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+
+        await asyncio.sleep(RECONNECT_DELAY)
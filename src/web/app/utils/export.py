@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import AsyncGenerator, AsyncIterator, Sequence
+
+from sqlalchemy import Row
+
+from app.schemas.trading import ExportFormat
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: 'application/x-ndjson',
+    ExportFormat.CSV: 'text/csv',
+    ExportFormat.ARROW: 'application/vnd.apache.arrow.stream',
+    ExportFormat.PARQUET: 'application/vnd.apache.parquet',
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self.__chunks: list[bytes] = []
+        self.__position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.__chunks.append(bytes(data))
+        self.__position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.__position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.__chunks)
+        self.__chunks.clear()
+        return data
+
+
+async def _encode_ndjson(
+    columns: Sequence[str], chunks: AsyncIterator[list[Row]]
+) -> AsyncGenerator[bytes, None]:
+    async for chunk in chunks:
+        lines = [
+            json.dumps(dict(zip(columns, row)), default=date.isoformat, ensure_ascii=False)
+            for row in chunk
+        ]
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+async def _encode_csv(
+    columns: Sequence[str], chunks: AsyncIterator[list[Row]]
+) -> AsyncGenerator[bytes, None]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    async for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def _encode_arrow(
+    columns: Sequence[str], chunks: AsyncIterator[list[Row]], parquet: bool
+) -> AsyncGenerator[bytes, None]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ('exchange_product_id', pa.string()),
+            ('exchange_product_name', pa.string()),
+            ('oil_id', pa.string()),
+            ('delivery_basis_id', pa.string()),
+            ('delivery_basis_name', pa.string()),
+            ('delivery_type_id', pa.string()),
+            ('volume', pa.int64()),
+            ('total', pa.int64()),
+            ('count', pa.int64()),
+            ('date', pa.date32()),
+        ]
+    )
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+
+    async for chunk in chunks:
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)],
+            schema=schema,
+        )
+        writer.write_batch(batch)
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+def encode_rows(
+    export_format: ExportFormat, columns: Sequence[str], chunks: AsyncIterator[list[Row]]
+) -> AsyncGenerator[bytes, None]:
+    if export_format == ExportFormat.NDJSON:
+        return _encode_ndjson(columns, chunks)
+    if export_format == ExportFormat.CSV:
+        return _encode_csv(columns, chunks)
+    return _encode_arrow(columns, chunks, parquet=export_format == ExportFormat.PARQUET)
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Any
+
+
+class LocalCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.__items: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.__max_size = max_size
+        self.__ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.__max_size > 0
+
+    def get(self, key: str) -> Any | None:
+        item = self.__items.get(key)
+        if item is None:
+            return None
+
+        expires_at, value = item
+        if expires_at < monotonic():
+            del self.__items[key]
+            return None
+
+        self.__items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+
+        self.__items[key] = (monotonic() + self.__ttl, value)
+        self.__items.move_to_end(key)
+        while len(self.__items) > self.__max_size:
+            self.__items.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.__items.pop(key, None)
+
+    def clear(self) -> None:
+        self.__items.clear()
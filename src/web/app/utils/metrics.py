@@ -0,0 +1,111 @@
+from time import perf_counter
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by cached method and outcome',
+    ['namespace', 'outcome'],
+)
+CACHE_LATENCY = Histogram(
+    'cache_request_duration_seconds',
+    'Time to serve a cached method call, including computation on a miss',
+    ['namespace', 'outcome'],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds',
+    'Database statement execution time',
+    ['engine'],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting for a pooled connection',
+    ['engine'],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out_connections',
+    'Connections currently checked out of the pool',
+    ['engine'],
+)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Pool events fire once a connection is handed out, so the wait is
+    # measured around the pool's own checkout.
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self.logging_name).observe(perf_counter() - started)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+    name = sync_engine.pool.logging_name
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_started'] = perf_counter()
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_LATENCY.labels(name).observe(perf_counter() - conn.info['query_started'])
+
+    DB_POOL_CHECKED_OUT.labels(name).set_function(lambda: sync_engine.pool.checkedout())
+
+
+class LatencyMiddleware:
+    # A plain ASGI middleware: it does not wrap responses into a stream like
+    # BaseHTTPMiddleware, and a streamed response is timed until its last
+    # body chunk rather than until the headers are sent.
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        status_code = 500
+        recorded = False
+
+        def record() -> None:
+            nonlocal recorded
+            recorded = True
+            route = scope.get('route')
+            REQUEST_LATENCY.labels(
+                scope['method'],
+                route.path if route else 'unmatched',
+                status_code,
+            ).observe(perf_counter() - started)
+
+        async def send_timed(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            if not recorded:
+                record()
@@ -0,0 +1,17 @@
+import base64
+import json
+from datetime import date
+
+
+def encode_cursor(date_: date, id_: int) -> str:
+    payload = json.dumps([date_.isoformat(), id_], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date_str, id_ = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return date.fromisoformat(date_str), int(id_)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor.') from e
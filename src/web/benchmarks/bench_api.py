@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from time import perf_counter
+
+from httpx import ASGITransport, AsyncClient, Limits
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.database import dispose_engines  # noqa: E402
+from app.core.redis import redis_client  # noqa: E402
+from app.main import app  # noqa: E402
+from app.utils.cache import _publish_invalidation, local_cache  # noqa: E402
+from bench_queries import seed  # noqa: E402
+
+Request = tuple[str, tuple[tuple[str, str], ...]]
+
+
+def build_requests(count: int, start_date: date, days: int, rng: random.Random) -> list[Request]:
+    oil_ids = [f'A{i:03d}' for i in range(50)]
+    bases = [f'B{i:02d}' for i in range(20)]
+
+    def period() -> dict[str, str]:
+        start = start_date + timedelta(days=rng.randrange(days))
+        end = start + timedelta(days=rng.choice((7, 30, 90, 365)))
+        return {'start_date': start.isoformat(), 'end_date': end.isoformat()}
+
+    generators = (
+        lambda: ('dates', {'limit': rng.choice((10, 50, 200))}),
+        lambda: ('last-trades', {}),
+        lambda: ('last-trades', {'oil_id': rng.choice(oil_ids)}),
+        lambda: (
+            'last-trades',
+            {'delivery_basis_id': rng.choice(bases), 'delivery_type_id': rng.choice('AFJ')},
+        ),
+        lambda: ('range-trades', {'oil_id': rng.choice(oil_ids)} | period()),
+        lambda: (
+            'dynamics',
+            {'group_by': 'oil_id', 'period': rng.choice(('week', 'month'))} | period(),
+        ),
+    )
+
+    requests = {}
+    for _ in range(count * 20):
+        if len(requests) == count:
+            break
+        endpoint, params = rng.choice(generators)()
+        request = (endpoint, tuple(sorted((key, str(value)) for key, value in params.items())))
+        requests.setdefault(request, None)
+    return list(requests)
+
+
+async def flush_cache() -> None:
+    keys = [key async for key in redis_client.scan_iter(match='cache:*', count=1000)]
+    for i in range(0, len(keys), 1000):
+        chunk = [key.decode() for key in keys[i : i + 1000]]
+        await redis_client.delete(*chunk)
+        # Clears the L1 caches of a running server as well.
+        await _publish_invalidation(chunk)
+    local_cache.clear()
+
+
+def summarize(timings: list[float], errors: int, elapsed: float) -> dict[str, float]:
+    timings = sorted(timings)
+
+    def percentile(q: float) -> float:
+        return round(timings[min(len(timings) - 1, int(q * len(timings)))] * 1000, 3)
+
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': percentile(0.5),
+        'p90_ms': percentile(0.9),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(timings[-1] * 1000, 3),
+    }
+
+
+async def run_phase(client: AsyncClient, requests: list[Request], clients: int) -> dict:
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+
+    async def worker() -> None:
+        while not queue.empty():
+            endpoint, params = queue.get_nowait()
+            started = perf_counter()
+            response = await client.get(f'/api/trading/{endpoint}', params=params)
+            timings[endpoint].append(perf_counter() - started)
+            if response.status_code != 200:
+                errors[endpoint] += 1
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = perf_counter() - started
+
+    all_timings = [timing for endpoint_timings in timings.values() for timing in endpoint_timings]
+    return {
+        'total': summarize(all_timings, sum(errors.values()), elapsed),
+        'endpoints': {
+            endpoint: summarize(endpoint_timings, errors[endpoint], elapsed)
+            for endpoint, endpoint_timings in sorted(timings.items())
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Load test the trading API.')
+    parser.add_argument('--days', type=int, default=750)
+    parser.add_argument('--instruments', type=int, default=300)
+    parser.add_argument('--start-date', type=date.fromisoformat, default=date(2023, 1, 1))
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--requests', type=int, default=1000, help='distinct requests per phase')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent clients')
+    parser.add_argument('--url', help='running server to test instead of the in-process app')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        print(f'Seeding {args.days * args.instruments} rows...', file=sys.stderr)
+        await seed(args.days, args.instruments, args.start_date)
+
+    requests = build_requests(args.requests, args.start_date, args.days, random.Random(args.seed))
+
+    if args.url:
+        client = AsyncClient(base_url=args.url, limits=Limits(max_connections=args.clients))
+    else:
+        client = AsyncClient(transport=ASGITransport(app=app), base_url='http://bench')
+
+    async with client:
+        await flush_cache()
+        cold = await run_phase(client, requests, args.clients)
+        warm = await run_phase(client, requests, args.clients)
+
+    print(
+        json.dumps(
+            {
+                'config': {
+                    'rows': args.days * args.instruments,
+                    'requests': len(requests),
+                    'clients': args.clients,
+                    'target': args.url or 'in-process',
+                },
+                'cold': cold,
+                'warm': warm,
+            },
+            indent=2,
+        )
+    )
+    await dispose_engines()
+    await redis_client.aclose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import pickle
+import statistics
+import sys
+from datetime import date
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.schemas.trading import (  # noqa: E402
+    DateSchema,
+    DayStatsSchema,
+    TradingPageSchema,
+    TradingSchema,
+)
+from app.utils import codec  # noqa: E402
+
+REPEATS = 200
+
+
+def make_page(rows: int) -> TradingPageSchema:
+    bases = [('ANK', 'Ангарск-группа станций'), ('NVY', 'Новоярославская'), ('UFM', 'Уфа')]
+    items = []
+    for i in range(rows):
+        basis_id, basis_name = bases[i % len(bases)]
+        oil_id = f'A{i % 40:03d}'
+        items.append(
+            TradingSchema(
+                exchange_product_id=f'{oil_id}{basis_id}060F',
+                exchange_product_name=f'Бензин (АИ-92-К5) {oil_id}, ст. {basis_name}',
+                oil_id=oil_id,
+                delivery_basis_id=basis_id,
+                delivery_basis_name=basis_name,
+                delivery_type_id='F',
+                volume=i * 60,
+                total=i * 60 * 65000,
+                count=i % 30 + 1,
+                date=date(2025, 1, 1 + i % 28),
+            )
+        )
+    return TradingPageSchema(items=items, next_cursor='eyJkIjoiMjAyNS0wMS0wMSJ9')
+
+
+def make_dates(rows: int) -> list[DateSchema]:
+    return [
+        DateSchema(
+            date=date.fromordinal(date(2025, 1, 1).toordinal() - i),
+            stats=DayStatsSchema(rows_count=300 + i, volume=i * 1000, total=i * 65_000_000),
+        )
+        for i in range(rows)
+    ]
+
+
+def measure(func) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = perf_counter()
+        func()
+        timings.append(perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+
+def report(name: str, value) -> None:
+    entry = (1_700_000_000.0, value)
+    formats = {
+        'pickle': (pickle.dumps, pickle.loads),
+        'msgpack': (lambda v: codec.encode(v, compress_min_size=2**31), codec.decode),
+        'msgpack+zstd': (lambda v: codec.encode(v, compress_min_size=0), codec.decode),
+    }
+
+    print(f'\n{name}')
+    print(f'{"format":<14} {"bytes":>8} {"encode us":>10} {"decode us":>10}')
+    for format_name, (dumps, loads) in formats.items():
+        data = dumps(entry)
+        encode_time = measure(lambda: dumps(entry))
+        decode_time = measure(lambda: loads(data))
+        print(f'{format_name:<14} {len(data):>8} {encode_time:>10.1f} {decode_time:>10.1f}')
+
+
+def main():
+    report('200-row trades page', make_page(200))
+    report('20-row trades page', make_page(20))
+    report('200 dates with stats', make_dates(200))
+
+
+if __name__ == '__main__':
+    main()
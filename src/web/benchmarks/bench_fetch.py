@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import statistics
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from sqlalchemy import desc, select
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.database import engine, session_factory  # noqa: E402
+from app.models.trading import TradingResult  # noqa: E402
+from app.schemas.trading import TradingSchema  # noqa: E402
+from app.services.trading import TradingService  # noqa: E402
+
+
+async def fetch_orm(session, limit: int) -> list[TradingSchema]:
+    stmt = (
+        select(TradingResult)
+        .order_by(desc(TradingResult.date), desc(TradingResult.id))
+        .limit(limit)
+    )
+    result = await session.scalars(stmt)
+    trades = [TradingSchema.model_validate(trading) for trading in result.all()]
+    session.expunge_all()
+    return trades
+
+
+async def fetch_lean(service: TradingService, limit: int) -> list[TradingSchema]:
+    page = await TradingService.get_last_trades_page.__wrapped__(
+        service,
+        limit=limit,
+        offset=0,
+        cursor=None,
+        oil_id=None,
+        delivery_type_id=None,
+        delivery_basis_id=None,
+    )
+    return page.items
+
+
+async def measure(fetch, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = perf_counter()
+        await fetch()
+        timings.append(perf_counter() - started)
+    return statistics.median(timings)
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description='Compare ORM and column fetches of a trades page on seeded data.'
+    )
+    parser.add_argument('--limit', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    async with session_factory() as session:
+        service = TradingService(session)
+
+        orm_trades = await fetch_orm(session, args.limit)
+        if not orm_trades:
+            sys.exit('No trades found, seed the database with bench_queries.py first.')
+        if await fetch_lean(service, args.limit) != orm_trades:
+            sys.exit('Column fetch does not match the ORM fetch.')
+
+        orm_time = await measure(lambda: fetch_orm(session, args.limit), args.repeats)
+        lean_time = await measure(lambda: fetch_lean(service, args.limit), args.repeats)
+
+    rows = len(orm_trades)
+    print(
+        f'{rows}-row page: '
+        f'orm {orm_time / rows * 1e6:.1f} us/row, '
+        f'lean {lean_time / rows * 1e6:.1f} us/row'
+    )
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from time import perf_counter
+
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.database import engine, session_factory  # noqa: E402
+from app.models.base import Base  # noqa: E402
+from app.models.trading import TradingResult  # noqa: E402
+from app.services.trading import TradingService  # noqa: E402
+
+SEED_SQL = """
+INSERT INTO trading_results (
+    exchange_product_id, exchange_product_name, oil_id, delivery_basis_id,
+    delivery_basis_name, delivery_type_id, volume, total, count, date
+)
+SELECT
+    oil_id || basis_id || lpad((i / 1000)::text, 3, '0') || type_id,
+    'Product ' || oil_id || ' ' || basis_id,
+    oil_id,
+    basis_id,
+    'Basis ' || basis_id,
+    type_id,
+    (i * 7 + d) % 5000 + 60,
+    ((i * 7 + d) % 5000 + 60) * 60000,
+    (i + d) % 30 + 1,
+    CAST(:start_date AS date) + d
+FROM generate_series(0, :days - 1) AS d,
+     generate_series(0, :instruments - 1) AS i,
+     LATERAL (
+         SELECT
+             'A' || lpad((i % 50)::text, 3, '0') AS oil_id,
+             'B' || lpad(((i / 50) % 20)::text, 2, '0') AS basis_id,
+             (ARRAY['A', 'F', 'J'])[i % 3 + 1] AS type_id
+     ) AS ids
+"""
+
+# Same aggregates the parser maintains after loading each day.
+DAYS_SQL = """
+INSERT INTO trading_days (date, rows_count, volume, total)
+SELECT date, count(*), sum(volume), sum(total)
+FROM trading_results
+GROUP BY date
+"""
+
+ROLLUPS_SQL = """
+INSERT INTO trading_rollups (date, dimension, value, volume, total, count)
+SELECT date, dimension, value, sum(volume), sum(total), sum(count)
+FROM trading_results,
+     LATERAL (VALUES
+         ('oil_id', oil_id),
+         ('delivery_basis_id', delivery_basis_id),
+         ('delivery_type_id', delivery_type_id)
+     ) AS dimensions (dimension, value)
+GROUP BY date, dimension, value
+"""
+
+
+def get_queries(start_date: date) -> dict:
+    filters = {'oil_id': None, 'delivery_type_id': None, 'delivery_basis_id': None}
+    range_filters = filters | {'start_date': start_date, 'end_date': None}
+    first_page = {'limit': 200, 'offset': 0, 'cursor': None}
+    return {
+        'dates': (TradingService.get_dates, {'limit': 200, 'offset': 0}),
+        'last-trades': (TradingService.get_last_trades_page, first_page | filters),
+        'last-trades?oil_id': (
+            TradingService.get_last_trades_page,
+            first_page | filters | {'oil_id': 'A007'},
+        ),
+        'last-trades?delivery_basis_id&delivery_type_id': (
+            TradingService.get_last_trades_page,
+            first_page | filters | {'delivery_basis_id': 'B03', 'delivery_type_id': 'F'},
+        ),
+        'last-trades deep offset': (
+            TradingService.get_last_trades_page,
+            first_page | filters | {'offset': 100_000},
+        ),
+        'range-trades?oil_id': (
+            TradingService.get_range_trades_page,
+            first_page | range_filters | {'oil_id': 'A007'},
+        ),
+    }
+
+
+async def seed(days: int, instruments: int, start_date: date) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            text('TRUNCATE TABLE trading_results, trading_days, trading_rollups RESTART IDENTITY')
+        )
+
+        month = start_date.replace(day=1)
+        while month <= start_date + timedelta(days=days):
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            await conn.execute(
+                text(
+                    f'CREATE TABLE IF NOT EXISTS trading_results_p{month:%Y_%m} '
+                    f'PARTITION OF trading_results '
+                    f"FOR VALUES FROM ('{month}') TO ('{next_month}')"
+                )
+            )
+            month = next_month
+
+        await conn.execute(
+            text(SEED_SQL),
+            {'start_date': start_date, 'days': days, 'instruments': instruments},
+        )
+        await conn.execute(text(DAYS_SQL))
+        await conn.execute(text(ROLLUPS_SQL))
+        for table in ('trading_results', 'trading_days', 'trading_rollups'):
+            await conn.execute(text(f'ANALYZE {table}'))
+
+
+async def set_indexes(enabled: bool) -> None:
+    async with engine.begin() as conn:
+        for index in TradingResult.__table__.indexes:
+            if enabled:
+                await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+            else:
+                await conn.run_sync(lambda sync_conn: index.drop(sync_conn, checkfirst=True))
+        await conn.execute(text('ANALYZE trading_results'))
+
+
+async def measure(queries: dict, repeats: int) -> dict[str, dict[str, float]]:
+    results = {}
+    async with session_factory() as session:
+        service = TradingService(session)
+        for name, (method, kwargs) in queries.items():
+            timings = []
+            for _ in range(repeats):
+                started = perf_counter()
+                await method.__wrapped__(service, **kwargs)
+                timings.append((perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = {
+                'median_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+            }
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Benchmark trading API queries.')
+    parser.add_argument('--days', type=int, default=2500)
+    parser.add_argument('--instruments', type=int, default=800)
+    parser.add_argument('--start-date', type=date.fromisoformat, default=date(2015, 1, 1))
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--skip-seed', action='store_true')
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        print(f'Seeding {args.days * args.instruments} rows...', file=sys.stderr)
+        await seed(args.days, args.instruments, args.start_date)
+
+    queries = get_queries(args.start_date)
+
+    await set_indexes(False)
+    before = await measure(queries, args.repeats)
+    await set_indexes(True)
+    after = await measure(queries, args.repeats)
+
+    print(json.dumps({'before': before, 'after': after}, indent=2))
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,9 +1,15 @@
+import csv
+import io
+import json
 from datetime import date
 
 import pytest
 import pytest_asyncio
-from app.main import app
-from app.models.trading import TradingResult
+from app.api.trading import warm_trading_cache
+from app.main import app, on_listener_connect
+from app.models.trading import TradingDay, TradingResult
+from app.services.trading import TradingService
+from app.utils.cache import cache_stats, flush_cache_stats, invalidate_date, invalidate_latest
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy import desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -27,6 +33,14 @@ async def fill_trading_data(session: AsyncSession) -> None:
                 date=date(2025, 1, i % 30),
             )
         )
+        trading_data.append(
+            TradingDay(
+                date=date(2025, 1, i % 30),
+                rows_count=1,
+                volume=i,
+                total=i,
+            )
+        )
     session.add_all(trading_data)
     await session.commit()
 
@@ -60,6 +74,7 @@ class TestTradingAPI:
             api_dates = [item['date'] for item in data]
 
             assert api_dates == db_dates_formatted
+            assert all('stats' not in item for item in data)
 
     async def test_get_trading_results(self, session: AsyncSession, fill_trading_data):
         async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
@@ -122,3 +137,154 @@ class TestTradingAPI:
                 assert api_trade['oil_id'] == db_trade.oil_id
                 assert api_trade['delivery_basis_id'] == db_trade.delivery_basis_id
                 assert api_trade['count'] == db_trade.count
+
+    async def test_get_trading_results_with_cursor(self, session: AsyncSession, fill_trading_data):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+            first_response = await ac.get('/api/trading/last-trades', params={'limit': 4})
+            assert first_response.status_code == 200
+            cursor = first_response.headers['X-Next-Cursor']
+
+            second_response = await ac.get(
+                '/api/trading/last-trades',
+                params={'limit': 4, 'cursor': cursor},
+            )
+            assert second_response.status_code == 200
+
+            offset_response = await ac.get(
+                '/api/trading/last-trades',
+                params={'limit': 4, 'offset': 4},
+            )
+            assert second_response.json() == offset_response.json()
+
+            invalid_response = await ac.get(
+                '/api/trading/last-trades',
+                params={'cursor': 'invalid'},
+            )
+            assert invalid_response.status_code == 400
+
+    async def test_get_trading_results_not_modified(self, session: AsyncSession, fill_trading_data):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+            response = await ac.get('/api/trading/last-trades', params={'limit': 10})
+            assert response.status_code == 200
+            etag = response.headers['ETag']
+
+            cached_response = await ac.get(
+                '/api/trading/last-trades',
+                params={'limit': 10},
+                headers={'If-None-Match': etag},
+            )
+            assert cached_response.status_code == 304
+            assert cached_response.headers['ETag'] == etag
+            assert cached_response.content == b''
+
+            identity_response = await ac.get(
+                '/api/trading/last-trades',
+                params={'limit': 10},
+                headers={'If-None-Match': etag, 'Accept-Encoding': 'identity'},
+            )
+            assert identity_response.status_code == 304
+
+    async def test_warm_trading_cache(self, session: AsyncSession, fill_trading_data):
+        namespace = f'response:{TradingService.get_last_trades_page.namespace}'
+        params = {'oil_id': 'oid1'}
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+            response = await ac.get('/api/trading/last-trades', params=params)
+            assert response.status_code == 200
+
+            await flush_cache_stats()
+            await invalidate_latest()
+            assert await warm_trading_cache() >= 2
+
+            for request_params in ({}, params):
+                response = await ac.get('/api/trading/last-trades', params=request_params)
+                assert response.status_code == 200
+
+        assert cache_stats[namespace] == {'hits': 2}
+
+    async def test_warm_trading_cache_dynamics(self, session: AsyncSession, fill_trading_data):
+        namespace = f'response:{TradingService.get_dynamics.namespace}'
+        params = {'group_by': 'delivery_type_id', 'period': 'month'}
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+            response = await ac.get('/api/trading/dynamics', params=params)
+            assert response.status_code == 200
+
+            await flush_cache_stats()
+            await invalidate_date(date(2025, 1, 5))
+            assert await warm_trading_cache() >= 3
+
+            response = await ac.get('/api/trading/dynamics', params=params)
+            assert response.status_code == 200
+
+        assert cache_stats[namespace] == {'hits': 1}
+
+    async def test_listener_connect_keeps_warm_cache(
+        self, session: AsyncSession, fill_trading_data
+    ):
+        namespace = f'response:{TradingService.get_last_trades_page.namespace}'
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+            await on_listener_connect(False)
+            response = await ac.get('/api/trading/last-trades')
+            assert response.status_code == 200
+
+            await flush_cache_stats()
+            await on_listener_connect(False)
+            response = await ac.get('/api/trading/last-trades')
+            assert response.status_code == 200
+
+        assert cache_stats[namespace] == {'hits': 1}
+
+    async def test_export_trades(self, session: AsyncSession, fill_trading_data):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+            ndjson_response = await ac.get(
+                '/api/trading/export',
+                params={'format': 'ndjson', 'end_date': date(2025, 1, 5)},
+            )
+            assert ndjson_response.status_code == 200
+            assert ndjson_response.headers['content-type'] == 'application/x-ndjson'
+            rows = [json.loads(line) for line in ndjson_response.text.splitlines()]
+
+            csv_response = await ac.get(
+                '/api/trading/export',
+                params={'format': 'csv', 'end_date': date(2025, 1, 5)},
+            )
+            assert csv_response.status_code == 200
+            csv_rows = list(csv.DictReader(io.StringIO(csv_response.text)))
+
+        stmt = (
+            select(TradingResult)
+            .where(TradingResult.date <= date(2025, 1, 5))
+            .order_by(desc(TradingResult.date), desc(TradingResult.id))
+        )
+        db_result = await session.scalars(stmt)
+        db_trades = db_result.all()
+
+        assert [row['exchange_product_id'] for row in rows] == [
+            trade.exchange_product_id for trade in db_trades
+        ]
+        assert [row['date'] for row in csv_rows] == [trade.date.isoformat() for trade in db_trades]
+        assert [int(row['volume']) for row in csv_rows] == [trade.volume for trade in db_trades]
+
+    async def test_get_metrics(self, session: AsyncSession, fill_trading_data):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url='http://test') as ac:
+            response = await ac.get('/api/trading/dates')
+            assert response.status_code == 200
+            response = await ac.get('/api/trading/export')
+            assert response.status_code == 200
+
+            metrics_response = await ac.get('/metrics')
+            assert metrics_response.status_code == 200
+
+        metrics = metrics_response.text
+        assert (
+            'http_request_duration_seconds_count'
+            '{method="GET",route="/api/trading/dates",status="200"}'
+        ) in metrics
+        assert (
+            'http_request_duration_seconds_count'
+            '{method="GET",route="/api/trading/export",status="200"}'
+        ) in metrics
+        assert 'cache_requests_total{namespace="response:TradingService.get_dates:v1"' in metrics
+        assert 'db_pool_checked_out_connections{engine="primary"}' in metrics
@@ -2,11 +2,25 @@ from datetime import date
 
 import pytest
 import pytest_asyncio
-from app.models.trading import TradingResult
-from app.schemas.trading import TradingSchema
+from app.models.trading import TradingDay, TradingResult, TradingRollup
+from app.schemas.trading import GroupBy, Period, TradingSchema
 from app.services.trading import TradingService
-from sqlalchemy import desc, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.cache import invalidate_latest
+from sqlalchemy import desc, func, insert, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+@pytest_asyncio.fixture
+async def create_partitions(session: AsyncSession) -> None:
+    for month in (1, 2):
+        await session.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS trading_results_p2025_{month:02d} '
+                f'PARTITION OF trading_results '
+                f"FOR VALUES FROM ('2025-{month:02d}-01') TO ('2025-{month + 1:02d}-01')"
+            )
+        )
+    await session.commit()
 
 
 @pytest_asyncio.fixture
@@ -27,10 +41,37 @@ async def fill_trading_data(session: AsyncSession) -> None:
                 date=date(2025, 1, i % 30),
             )
         )
+        trading_data.append(
+            TradingDay(
+                date=date(2025, 1, i % 30),
+                rows_count=1,
+                volume=i,
+                total=i,
+            )
+        )
     session.add_all(trading_data)
     await session.commit()
 
 
+@pytest_asyncio.fixture
+async def fill_trading_rollups(session: AsyncSession, fill_trading_data) -> None:
+    for dimension in ('oil_id', 'delivery_basis_id', 'delivery_type_id'):
+        value = getattr(TradingResult, dimension)
+        stmt = insert(TradingRollup).from_select(
+            ['date', 'dimension', 'value', 'volume', 'total', 'count'],
+            select(
+                TradingResult.date,
+                literal(dimension),
+                value,
+                func.sum(TradingResult.volume),
+                func.sum(TradingResult.total),
+                func.sum(TradingResult.count),
+            ).group_by(TradingResult.date, value),
+        )
+        await session.execute(stmt)
+    await session.commit()
+
+
 @pytest.mark.asyncio
 class TestTradingService:
     async def test_get_dates(self, session: AsyncSession, fill_trading_data):
@@ -51,6 +92,29 @@ class TestTradingService:
 
         assert service_result_dates == db_result_dates
 
+    async def test_get_dates_with_stats(self, session: AsyncSession, fill_trading_data):
+        service = TradingService(session)
+
+        service_result = await service.get_dates(limit=10, offset=0, with_stats=True)
+
+        stmt = (
+            select(
+                TradingResult.date,
+                func.count(),
+                func.sum(TradingResult.volume),
+                func.sum(TradingResult.total),
+            )
+            .group_by(TradingResult.date)
+            .order_by(desc(TradingResult.date))
+            .limit(10)
+        )
+        db_result = await session.execute(stmt)
+
+        assert [
+            (item.date, item.stats.rows_count, item.stats.volume, item.stats.total)
+            for item in service_result
+        ] == [tuple(row) for row in db_result.all()]
+
     async def test_get_last_trades(self, session: AsyncSession, fill_trading_data):
         service = TradingService(session)
 
@@ -97,3 +161,86 @@ class TestTradingService:
         db_trade_schemas = [TradingSchema.model_validate(trading) for trading in db_trades]
 
         assert service_trades == db_trade_schemas
+
+    async def test_get_last_trades_page_walks_all_pages(
+        self, session: AsyncSession, fill_trading_data
+    ):
+        service = TradingService(session)
+
+        service_trades = []
+        cursor = None
+        while True:
+            page = await service.get_last_trades_page(
+                limit=3,
+                offset=0,
+                cursor=cursor,
+                oil_id=None,
+                delivery_type_id=None,
+                delivery_basis_id=None,
+            )
+            service_trades.extend(page.items)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        stmt = select(TradingResult).order_by(desc(TradingResult.date), desc(TradingResult.id))
+        db_result = await session.scalars(stmt)
+        db_trade_schemas = [TradingSchema.model_validate(trading) for trading in db_result.all()]
+
+        assert service_trades == db_trade_schemas
+
+    async def test_get_dynamics(self, session: AsyncSession, fill_trading_rollups):
+        service = TradingService(session)
+
+        dynamics = await service.get_dynamics(
+            group_by=GroupBy.DELIVERY_TYPE_ID,
+            period=Period.MONTH,
+            start_date=date(2025, 1, 1),
+            end_date=date(2025, 1, 31),
+        )
+
+        stmt = (
+            select(
+                TradingResult.delivery_type_id,
+                func.sum(TradingResult.volume),
+                func.sum(TradingResult.total),
+                func.sum(TradingResult.count),
+            )
+            .group_by(TradingResult.delivery_type_id)
+            .order_by(TradingResult.delivery_type_id)
+        )
+        db_result = await session.execute(stmt)
+
+        assert [
+            (item.period, item.group, item.volume, item.total, item.count) for item in dynamics
+        ] == [(date(2025, 1, 1), *row) for row in db_result.all()]
+        assert all(item.average_price == item.total / item.volume for item in dynamics)
+
+    async def test_cache_hit_does_not_open_session(self, session: AsyncSession, fill_trading_data):
+        await invalidate_latest()
+        session_factory = async_sessionmaker(session.bind, expire_on_commit=False)
+
+        service = TradingService(session_factory=session_factory)
+        dates = await service.get_dates(limit=10, offset=0)
+        assert service._session is not None
+        await service.close()
+        assert service._session is None
+
+        service = TradingService(session_factory=session_factory)
+        assert await service.get_dates(limit=10, offset=0) == dates
+        assert service._session is None
+
+    async def test_range_trades_prune_partitions(
+        self, session: AsyncSession, create_partitions, fill_trading_data
+    ):
+        stmt = TradingService._trades_stmt(
+            None, None, None, start_date=date(2025, 1, 2), end_date=date(2025, 1, 5)
+        )
+        compiled = stmt.compile(session.bind, compile_kwargs={'literal_binds': True})
+
+        result = await session.execute(text(f'EXPLAIN {compiled}'))
+        plan = '\n'.join(result.scalars().all())
+
+        assert 'trading_results_p2025_01' in plan
+        assert 'trading_results_p2025_02' not in plan
+        assert 'trading_results_default' not in plan
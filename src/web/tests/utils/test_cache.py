@@ -0,0 +1,193 @@
+import asyncio
+from datetime import date
+
+import msgpack
+import pytest
+from app.core.redis import redis_client
+from app.utils import codec
+from app.utils.cache import (
+    LATEST_TAG_KEY,
+    RANGE_EXPIRY_KEY,
+    RANGE_STARTS_KEY,
+    RANGES_KEY,
+    STATS_KEY_PREFIX,
+    _dumps,
+    _loads,
+    async_cache,
+    bump_generation,
+    cache_stats,
+    flush_cache_stats,
+    invalidate_date,
+    local_cache,
+)
+
+JANUARY = (date(2025, 1, 1), date(2025, 1, 31))
+FEBRUARY = (date(2025, 2, 1), date(2025, 2, 28))
+OPEN_RANGE = (date(2025, 1, 15), None)
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    @async_cache()
+    async def latest(self, limit: int) -> int:
+        self.calls += 1
+        return self.calls
+
+    @async_cache()
+    async def with_defaults(self, start_date: date, limit: int = 10) -> int:
+        self.calls += 1
+        return self.calls
+
+    @async_cache(covers=lambda arguments: (arguments['start_date'], arguments['end_date']))
+    async def range(self, start_date: date | None, end_date: date | None) -> int:
+        self.calls += 1
+        return self.calls
+
+
+class SlowCounter:
+    def __init__(self):
+        self.calls = 0
+
+    @async_cache()
+    async def slow(self, key: int) -> int:
+        self.calls += 1
+        await asyncio.sleep(0.1)
+        return self.calls
+
+    @async_cache(ttl=1, jitter=0)
+    async def expiring(self, key: int) -> int:
+        self.calls += 1
+        return self.calls
+
+
+@pytest.mark.asyncio
+class TestAsyncCache:
+    async def test_invalidate_date(self):
+        await redis_client.flushdb()
+        local_cache.clear()
+        counter = Counter()
+
+        latest = await counter.latest(limit=10)
+        january = await counter.range(*JANUARY)
+        february = await counter.range(*FEBRUARY)
+        open_range = await counter.range(*OPEN_RANGE)
+
+        assert await counter.latest(limit=10) == latest
+        assert await counter.range(*JANUARY) == january
+
+        invalidated = await invalidate_date(date(2025, 1, 20))
+        assert len(invalidated) == 3
+
+        assert await counter.latest(limit=10) != latest
+        assert await counter.range(*JANUARY) != january
+        assert await counter.range(*FEBRUARY) == february
+        assert await counter.range(*OPEN_RANGE) != open_range
+
+    async def test_closed_ranges_outlive_open_ones(self):
+        await redis_client.flushdb()
+        local_cache.clear()
+        counter = Counter()
+
+        await counter.latest(limit=1)
+        await counter.range(*JANUARY)
+
+        latest_keys = await redis_client.keys('cache:Counter.latest:*')
+        range_keys = await redis_client.keys('cache:Counter.range:*')
+        latest_ttl = await redis_client.ttl(latest_keys[0])
+        range_ttl = await redis_client.ttl(range_keys[0])
+
+        assert 0 < latest_ttl < range_ttl
+
+    async def test_expired_keys_are_pruned(self):
+        await redis_client.flushdb()
+        local_cache.clear()
+        counter = Counter()
+
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zadd(LATEST_TAG_KEY, {'cache:expired': 1})
+            pipe.zadd(RANGES_KEY, {'cache:expired': '+inf'})
+            pipe.hset(RANGE_STARTS_KEY, 'cache:expired', 0)
+            pipe.zadd(RANGE_EXPIRY_KEY, {'cache:expired': 1})
+            await pipe.execute()
+
+        await counter.latest(limit=10)
+        await counter.range(*JANUARY)
+
+        assert await redis_client.zscore(LATEST_TAG_KEY, 'cache:expired') is None
+        assert await redis_client.zscore(RANGES_KEY, 'cache:expired') is None
+        assert await redis_client.hget(RANGE_STARTS_KEY, 'cache:expired') is None
+        assert await redis_client.zcard(LATEST_TAG_KEY) == 1
+        assert await redis_client.zcard(RANGE_EXPIRY_KEY) == 1
+
+    async def test_bump_generation_drops_entries(self):
+        await redis_client.flushdb()
+        local_cache.clear()
+        counter = Counter()
+
+        latest = await counter.latest(limit=10)
+        january = await counter.range(*JANUARY)
+
+        await bump_generation()
+
+        assert await counter.latest(limit=10) != latest
+        assert await counter.range(*JANUARY) != january
+
+    async def test_concurrent_misses_are_coalesced(self):
+        await redis_client.flushdb()
+        local_cache.clear()
+        counter = SlowCounter()
+
+        results = await asyncio.gather(*(counter.slow(key=1) for _ in range(10)))
+
+        assert results == [1] * 10
+        assert counter.calls == 1
+
+    async def test_stale_value_is_served_while_revalidating(self):
+        await redis_client.flushdb()
+        local_cache.clear()
+        counter = SlowCounter()
+
+        assert await counter.expiring(key=1) == 1
+        await asyncio.sleep(1.1)
+
+        assert await counter.expiring(key=1) == 1
+        await asyncio.sleep(0.2)
+
+        assert await counter.expiring(key=1) == 2
+
+    async def test_local_cache_serves_without_redis(self):
+        await redis_client.flushdb()
+        local_cache.clear()
+        counter = Counter()
+
+        first = await counter.latest(limit=5)
+        await redis_client.flushdb()
+
+        assert await counter.latest(limit=5) == first
+        assert counter.calls == 1
+
+    async def test_equivalent_calls_share_key(self):
+        await redis_client.flushdb()
+        local_cache.clear()
+        cache_stats.clear()
+        counter = Counter()
+
+        first = await counter.with_defaults(date(2025, 1, 1))
+        assert await counter.with_defaults(start_date=date(2025, 1, 1)) == first
+        assert await counter.with_defaults(date(2025, 1, 1), limit=10) == first
+        assert await counter.with_defaults(limit=10, start_date=date(2025, 1, 1)) == first
+        assert counter.calls == 1
+
+        await flush_cache_stats()
+        stats = await redis_client.hgetall(f'{STATS_KEY_PREFIX}:Counter.with_defaults:v1')
+        assert stats == {b'hits': b'3', b'misses': b'1'}
+
+    async def test_unreadable_entries_are_misses(self):
+        packed = _dumps([1, 2])
+
+        assert _loads(packed) == [1, 2]
+        assert _loads(b'\x03' + packed[1:]) is None
+        assert _loads(codec.ZSTD + b'not zstd') is None
+        assert _loads(codec.RAW + msgpack.packb([codec.MODEL, 'Gone', [], []])) is None
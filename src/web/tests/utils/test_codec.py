@@ -0,0 +1,84 @@
+import pickle
+from datetime import date
+
+import pytest
+from app.schemas.trading import (
+    DateSchema,
+    DayStatsSchema,
+    DynamicsSchema,
+    TradingPageSchema,
+    TradingSchema,
+)
+from app.utils import codec
+
+
+def make_page(rows: int) -> TradingPageSchema:
+    return TradingPageSchema(
+        items=[
+            TradingSchema(
+                exchange_product_id=f'A{i % 10:03d}NVY060F',
+                exchange_product_name=f'Бензин (АИ-92-К5) {i % 10}',
+                oil_id=f'A{i % 10:03d}',
+                delivery_basis_id='NVY',
+                delivery_basis_name='Новоярославская',
+                delivery_type_id='F',
+                volume=i * 60,
+                total=i * 60 * 65000,
+                count=i % 30 + 1,
+                date=date(2025, 1, 1 + i % 28),
+            )
+            for i in range(200)
+        ],
+        next_cursor='cursor',
+    )
+
+
+class TestCodec:
+    @pytest.mark.parametrize(
+        'value',
+        [
+            (1.5, make_page(200)),
+            (None, make_page(200).items),
+            (
+                None,
+                [
+                    DateSchema(
+                        date=date(2025, 1, 1),
+                        stats=DayStatsSchema(rows_count=1, volume=2, total=3),
+                    )
+                ],
+            ),
+            (None, [DateSchema(date=date(2025, 1, 1)), DateSchema(date=date(2025, 1, 2))]),
+            (
+                None,
+                [
+                    DynamicsSchema(
+                        period=date(2025, 1, 1),
+                        group='A',
+                        volume=1,
+                        total=2,
+                        count=3,
+                        average_price=None,
+                    )
+                ],
+            ),
+            (None, []),
+            (None, 3),
+            (b'{"items":[]}', 'gzip', {'ETag': '"etag"'}),
+        ],
+    )
+    def test_round_trip(self, value):
+        assert codec.decode(codec.encode(value)) == value
+
+    def test_smaller_than_pickle(self):
+        entry = (1.5, make_page(200))
+
+        raw = codec.encode(entry, compress_min_size=2**31)
+        compressed = codec.encode(entry)
+
+        assert compressed[:1] == codec.ZSTD
+        assert len(compressed) < len(raw) < len(pickle.dumps(entry)) / 2
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            codec.decode(pickle.dumps((None, 1)))